@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+Report of the CX count and depth of the oracle circuits with and without
+ancillas for their multi-controlled gates (see mastermind.arithmetic.gates).
+
+Every circuit is built without ancillas, with a register of clean ancillas
+and with all other qubits of the circuit as dirty ancillas, and transpiled to
+u and cx gates. Run from the src directory, e.g.
+
+    python -m benchmarks.ancillas -n 2 3 4 -k 4 6 --circuits v1 v2 find_colours
+"""
+import argparse
+import json
+
+import numpy as np
+from qiskit import QuantumRegister, QuantumCircuit, transpile
+
+import mastermind.game.algorithms.Mastermind_Oracle as oracle
+from mastermind.arithmetic.gates import AncillaPool, set_ancilla_pool
+from mastermind.game.algorithms.resources import oracle_registers
+
+# Ways to provide the ancillas
+MODES = ('none', 'clean', 'dirty')
+
+# Basis the circuits are counted in
+BASIS = ['u', 'cx', 'id']
+
+
+def _registers(circuit_name, num_slots, colour_amount):
+    '''
+    Returns the quantum and classical registers of the circuit and the
+    function that builds it on them.
+    '''
+    # The b-oracle versions name the check circuit with that b-oracle
+    if circuit_name in oracle.B_ORACLES:
+        circuit_name = 'check_%s' % circuit_name
+    return oracle_registers(circuit_name, num_slots, colour_amount)
+
+
+def build_circuit(circuit_name, num_slots, colour_amount, mode='none', ancillas=None):
+    '''
+    Builds an oracle circuit for a random secret.
+
+    Parameters
+    ----------
+    circuit_name : Str
+        'v1', 'v2', 'fused' or 'poly' (check circuit with that b-oracle) or
+        'find_colours'.
+    num_slots : Int
+        Length of the secret.
+    colour_amount : Int
+        Number of colours.
+    mode : Str
+        One of MODES: no ancillas, a register of clean ancillas or the other
+        qubits of the circuit as dirty ancillas.
+    ancillas : Int, optional
+        Size of the clean ancilla register. The default, n*ceil(log(k)), is
+        enough for every gate.
+
+    Returns
+    -------
+    circuit : QuantumCircuit
+
+    '''
+    (registers, classical, build) = _registers(circuit_name, num_slots, colour_amount)
+    circuit = QuantumCircuit(*registers, *classical)
+    
+    pool = None
+    if mode == 'clean':
+        if ancillas is None:
+            ancillas = num_slots*int(np.ceil(np.log2(colour_amount)))
+        anc = QuantumRegister(ancillas, 'anc')
+        circuit.add_register(anc)
+        pool = AncillaPool(anc)
+    elif mode == 'dirty':
+        pool = AncillaPool(circuit.qubits, dirty=True)
+    elif mode != 'none':
+        raise ValueError("Unknown mode %s, choose one of %s" % (mode, ", ".join(MODES)))
+    
+    previous = set_ancilla_pool(pool)
+    try:
+        build(circuit)
+    finally:
+        set_ancilla_pool(previous)
+    return circuit
+
+
+def count_gates(circuit_name, num_slots, colour_amount, mode='none', ancillas=None):
+    '''
+    Returns the number of qubits, CX gates and the depth of an oracle circuit
+    transpiled to u and cx gates (without optimisation).
+    '''
+    circuit = build_circuit(circuit_name, num_slots, colour_amount, mode, ancillas)
+    transpiled = transpile(circuit, basis_gates=BASIS, optimization_level=0)
+    return {
+        'circuit': circuit_name,
+        'num_slots': num_slots,
+        'colour_amount': colour_amount,
+        'mode': mode,
+        'qubits': circuit.num_qubits,
+        'cx': transpiled.count_ops().get('cx', 0),
+        'depth': transpiled.depth(),
+    }
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="CX count and depth of the oracles with and without ancillas.")
+    parser.add_argument('-n', '--num-slots', type=int, nargs='+', default=[2, 3, 4])
+    parser.add_argument('-k', '--colour-amount', type=int, nargs='+', default=[4, 6])
+    parser.add_argument('--circuits', nargs='+', default=['v1', 'v2', 'find_colours'])
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=MODES)
+    parser.add_argument('--json', default=None, help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print("%-13s %4s %4s %6s %8s %10s %10s" % ('circuit', 'n', 'k', 'mode', 'qubits', 'cx', 'depth'))
+    for name in args.circuits:
+        for n in args.num_slots:
+            for k in args.colour_amount:
+                if name == 'find_colours' and k > n:
+                    continue
+                for mode in args.modes:
+                    r = count_gates(name, n, k, mode)
+                    results.append(r)
+                    print("%-13s %4d %4d %6s %8d %10d %10d" % (name, n, k, mode, r['qubits'], r['cx'], r['depth']))
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Runtime benchmark of the full Buhrman pipeline.
+
+Plays Buhrman's algorithm (find_colours, then find_colour_positions per used
+colour) for random secrets over a grid of MM(n,k) and reports per phase the
+time spent building the circuit, transpiling it and simulating it, plus the
+peak memory of the process. Runs on the local Aer simulator by default. Run
+from the src directory, e.g.
+
+    python -m benchmarks.buhrman -n 2 3 4 -k 2 3 --games 3 --json buhrman.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import sys
+import tracemalloc
+from abc import ABC
+from time import perf_counter
+
+import numpy as np
+
+from experiment.qiskit_experiment import QiskitExperiment
+from mastermind.game.algorithms.Buhrman import Buhrman
+from mastermind.game.algorithms.resources import oracle_registers
+from mastermind.game.quantumsolver import QuantumSolverGame
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Circuits with more qubits are not simulated (a statevector of 2**26 amplitudes takes 1 GiB)
+MAX_QUBITS = 26
+
+
+def max_rss():
+    '''
+    Returns the peak resident memory of this process in bytes (None where
+    unknown).
+    '''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak*1024
+
+
+class TimedExperiment(QiskitExperiment):
+    '''
+    Experiment that adds up the time spent transpiling and running.
+    '''
+
+    def __init__(self, *args, **kwargs):
+        super(TimedExperiment, self).__init__(*args, **kwargs)
+        self.transpile_time = 0.0
+        self.run_time = 0.0
+
+    def _transpile(self, circuit, optimization):
+        start = perf_counter()
+        transpiled = super(TimedExperiment, self)._transpile(circuit, optimization)
+        self.transpile_time += perf_counter() - start
+        return transpiled
+
+    def run(self, circuit, shots, optimization=1, parameter_binds=None):
+        start = perf_counter()
+        result = super(TimedExperiment, self).run(circuit, shots, optimization, parameter_binds)
+        self.run_time += perf_counter() - start
+        return result
+
+    def run_batch(self, circuits, shots, optimization=1, parameter_binds=None):
+        start = perf_counter()
+        counts = super(TimedExperiment, self).run_batch(circuits, shots, optimization, parameter_binds)
+        self.run_time += perf_counter() - start
+        return counts
+
+
+class BenchmarkBuhrman(Buhrman, QuantumSolverGame, ABC):
+    '''
+    Buhrman's algorithm against a given secret that records every phase.
+    '''
+
+    def __init__(self, secret, num_colours, experiment, trace_memory=False, workers=1):
+        self.secret = np.asarray(secret)
+        self.trace_memory = trace_memory
+        self.phases = []
+        super(BenchmarkBuhrman, self).__init__(len(secret), num_colours, experiment=experiment, workers=workers)
+
+    def random_sequence(self):
+        return self.secret
+
+    def lost(self, sequence):
+        pass
+
+    def won(self, moves_used, sequence):
+        pass
+
+    def get_input(self):
+        pass
+
+    def give_feedback(self, correct, semi_correct):
+        pass
+
+    def _phase(self, name, colour, method, *args):
+        '''
+        Runs one phase, recording its build, transpile and simulation time.
+        '''
+        experiment = self.experiment
+        (transpile_time, run_time) = (experiment.transpile_time, experiment.run_time)
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+
+        start = perf_counter()
+        result = method(*args)
+        total = perf_counter() - start
+
+        transpile_time = experiment.transpile_time - transpile_time
+        run_time = experiment.run_time - run_time
+        self.phases.append({
+            'phase': name,
+            'colour': colour,
+            'qubits': self.circuit.num_qubits,
+            'build': total - run_time,
+            'transpile': transpile_time,
+            'simulate': run_time - transpile_time,
+            'total': total,
+            'python_peak_bytes': tracemalloc.get_traced_memory()[1] if self.trace_memory else None,
+            'max_rss_bytes': max_rss(),
+        })
+        return result
+
+    def find_colours(self):
+        return self._phase('find_colours', None, super(BenchmarkBuhrman, self).find_colours)
+
+    def find_colour_positions(self, c, d, d_positions=None):
+        return self._phase('find_colour_positions', c, super(BenchmarkBuhrman, self).find_colour_positions,
+                           c, d, d_positions)
+
+    def find_colour_positions_alt(self, c):
+        return self._phase('find_colour_positions_alt', c, super(BenchmarkBuhrman, self).find_colour_positions_alt, c)
+
+    def find_all_colour_positions(self, colours, d, d_positions=None):
+        return self._phase('find_all_colour_positions', list(colours),
+                           super(BenchmarkBuhrman, self).find_all_colour_positions, colours, d, d_positions)
+
+
+def benchmark_game(secret, num_colours, experiment, trace_memory=False, workers=1):
+    '''
+    Plays Buhrman's algorithm against secret, without printing.
+
+    Returns
+    -------
+    result : dict
+        The phases (see BenchmarkBuhrman), the time per kind of work summed
+        over the phases, the wall time and whether the guess was correct.
+
+    '''
+    start = perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        game = BenchmarkBuhrman(secret, num_colours, experiment, trace_memory, workers)
+    wall_time = perf_counter() - start
+    return {
+        'secret': [int(colour) for colour in secret],
+        'correct': game.secret_string_guess == list(game.secret),
+        'wall_time': wall_time,
+        **{kind: sum(phase[kind] for phase in game.phases) for kind in ('build', 'transpile', 'simulate')},
+        'max_rss_bytes': max_rss(),
+        'phases': game.phases,
+    }
+
+
+def benchmark_pipeline(num_slots, colour_amount, games=1, experiment=None, trace_memory=False, seed=None, workers=1):
+    '''
+    Plays Buhrman's algorithm against games random secrets of
+    MM(num_slots, colour_amount).
+
+    Parameters
+    ----------
+    num_slots : Int
+        Length of the secret.
+    colour_amount : Int
+        Number of colours (at most num_slots).
+    games : Int
+        Number of secrets.
+    experiment : TimedExperiment, optional
+        Experiment to run on. The default runs on the local Aer simulator.
+    trace_memory : Bool
+        Whether to also trace the peak Python memory per phase (which slows
+        down building the circuits).
+    seed : Int, optional
+        Seed for the secrets.
+    workers : Int, optional
+        Processes building the colour position circuits (see Buhrman).
+
+    Returns
+    -------
+    results : list of dict
+        Result of every game (see benchmark_game).
+
+    '''
+    if experiment is None:
+        experiment = TimedExperiment('LOCAL')
+    rng = np.random.RandomState(seed)
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        return [benchmark_game(rng.randint(0, colour_amount, size=num_slots), colour_amount, experiment, trace_memory,
+                               workers) for _ in range(games)]
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Runtime benchmark of the Buhrman pipeline.")
+    parser.add_argument('-n', '--num-slots', type=int, nargs='+', default=[2, 3, 4])
+    parser.add_argument('-k', '--colour-amount', type=int, nargs='+', default=[2, 3])
+    parser.add_argument('--games', type=int, default=1, help="number of random secrets per size")
+    parser.add_argument('--backend', default='LOCAL', help="backend to run on (see choose_backend)")
+    parser.add_argument('--max-qubits', type=int, default=MAX_QUBITS, help="skip sizes needing more qubits")
+    parser.add_argument('--trace-memory', action='store_true', help="also trace the peak Python memory per phase")
+    parser.add_argument('--workers', type=int, default=1, help="processes building the colour position circuits")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', default=None, help="also write the report to this file")
+    args = parser.parse_args()
+
+    experiment = TimedExperiment(args.backend)
+    report = []
+    print("%4s %4s %7s %8s %10s %10s %10s %10s %10s" % ('n', 'k', 'qubits', 'correct', 'build (s)', 'transp (s)',
+                                                        'sim (s)', 'wall (s)', 'rss (MiB)'))
+    for n in args.num_slots:
+        for k in args.colour_amount:
+            if k > n:
+                continue
+            (registers, _, _) = oracle_registers('find_colours', n, k)
+            qubits = sum(len(register) for register in registers)
+            if qubits > args.max_qubits:
+                print("%4d %4d %7d  skipped (more than %d qubits)" % (n, k, qubits, args.max_qubits))
+                continue
+            games = benchmark_pipeline(n, k, args.games, experiment, args.trace_memory, args.seed, args.workers)
+            report.append({'num_slots': n, 'colour_amount': k, 'qubits': qubits, 'games': games})
+            rss = max(game['max_rss_bytes'] or 0 for game in games)/2**20
+            print("%4d %4d %7d %8s %10.3f %10.3f %10.3f %10.3f %10.1f" % (
+                n, k, qubits, "%d/%d" % (sum(game['correct'] for game in games), len(games)),
+                *(float(np.mean([game[kind] for game in games])) for kind in ('build', 'transpile', 'simulate', 'wall_time')),
+                rss))
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    _main()
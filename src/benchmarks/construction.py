@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the construction time of the Mastermind check circuit (the a-
+and b-oracle QuantumGame runs for every secret) over a grid of MM(n,k).
+
+Reports the time to build the circuit, the time of a single decompose() pass
+over the finished circuit and its size. Run from the src directory, e.g.
+
+    python -m benchmarks.construction -n 2 3 4 -k 2 4 6 8
+"""
+import argparse
+import json
+from time import perf_counter
+
+import numpy as np
+
+import mastermind.game.algorithms.Mastermind_Oracle as oracle
+from mastermind.game.algorithms.resources import build_oracle_circuit
+
+
+def build_check_circuit(num_slots, colour_amount, secret, do_v2_b_oracle=True, do_fused_b_oracle=False, b_oracle=None):
+    '''
+    Builds the check circuit of QuantumGame for secret (without the query
+    preparation).
+
+    Parameters
+    ----------
+    num_slots : Int
+        Length of the secret.
+    colour_amount : Int
+        Number of colours.
+    secret : Int list
+        Secret sequence.
+    do_v2_b_oracle : Bool
+        Whether to build the v2 b-oracle.
+    do_fused_b_oracle : Bool
+        Whether to build the fused b-oracle (takes precedence over v2).
+    b_oracle : Str, optional
+        Version of the b-oracle (see Mastermind_Oracle.B_ORACLES), takes
+        precedence over the flags.
+
+    Returns
+    -------
+    circuit : QuantumCircuit
+
+    '''
+    if b_oracle is None:
+        b_oracle = 'fused' if do_fused_b_oracle else 'v2' if do_v2_b_oracle else 'v1'
+    return build_oracle_circuit('check_%s' % b_oracle, num_slots, colour_amount, secret)
+
+
+def time_construction(num_slots, colour_amount, repeat=3, do_v2_b_oracle=True, seed=None, do_fused_b_oracle=False,
+                      b_oracle=None):
+    '''
+    Times building the check circuit of MM(num_slots, colour_amount) for
+    repeat random secrets.
+
+    Returns
+    -------
+    timing : dict
+        Best and mean build time, time of one decompose() pass (seconds),
+        number of instructions and qubits of the circuit.
+
+    '''
+    rng = np.random.RandomState(seed)
+    times = []
+    for _ in range(repeat):
+        secret = list(rng.randint(0, colour_amount, size=num_slots))
+        start = perf_counter()
+        circuit = build_check_circuit(num_slots, colour_amount, secret, do_v2_b_oracle, do_fused_b_oracle, b_oracle)
+        times.append(perf_counter() - start)
+    
+    start = perf_counter()
+    decomposed = circuit.decompose()
+    decompose_time = perf_counter() - start
+    
+    return {
+        'num_slots': num_slots,
+        'colour_amount': colour_amount,
+        'build_best': min(times),
+        'build_mean': float(np.mean(times)),
+        'decompose': decompose_time,
+        'instructions': len(circuit.data),
+        'decomposed_instructions': len(decomposed.data),
+        'qubits': circuit.num_qubits,
+    }
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Construction time of the Mastermind check circuit.")
+    parser.add_argument('-n', '--num-slots', type=int, nargs='+', default=[2, 3, 4])
+    parser.add_argument('-k', '--colour-amount', type=int, nargs='+', default=[2, 4, 6])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--v1', action='store_true', help="build the v1 b-oracle")
+    parser.add_argument('--fused', action='store_true', help="build the fused b-oracle")
+    parser.add_argument('--b-oracle', default=None, choices=oracle.B_ORACLES, help="b-oracle version to build")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', default=None, help="also write the results to this file")
+    args = parser.parse_args()
+
+    results = []
+    print("%4s %4s %8s %10s %10s %12s %12s" % ('n', 'k', 'qubits', 'build (s)', 'decomp (s)', 'instructions', 'decomposed'))
+    for n in args.num_slots:
+        for k in args.colour_amount:
+            r = time_construction(n, k, args.repeat, not args.v1, args.seed, args.fused, args.b_oracle)
+            results.append(r)
+            print("%4d %4d %8d %10.4f %10.4f %12d %12d" % (n, k, r['qubits'], r['build_best'], r['decompose'],
+                                                          r['instructions'], r['decomposed_instructions']))
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Construction benchmark suite of the arithmetic, the oracles and the Buhrman
+circuits.
+
+Times building every benchmark circuit over a grid of MM(n,k), records its
+gate count and depth (see mastermind.game.algorithms.resources) and writes
+the results as JSON, so that two commits can be compared. Runs offline; run
+from the src directory, e.g.
+
+    python -m benchmarks.suite -n 2 3 4 -k 2 4 6 --json before.json
+    python -m benchmarks.suite -n 2 3 4 -k 2 4 6 --json after.json
+    python -m benchmarks.suite --compare before.json after.json
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+from time import perf_counter
+
+import numpy as np
+import qiskit
+from qiskit import QuantumRegister, QuantumCircuit
+
+from mastermind.arithmetic.comp import compare
+from mastermind.arithmetic.count import count
+from mastermind.arithmetic.dradder import add, cadd
+from mastermind.arithmetic.increm import increment, cnincrement
+from mastermind.arithmetic.qft import qft, iqft
+from mastermind.game.algorithms.resources import oracle_registers, estimate_circuit, BASIS
+
+# Relative slowdown reported as a regression, unless it is below NOISE seconds
+THRESHOLD = 0.25
+NOISE = 5e-4
+
+
+def _arithmetic(build):
+    '''
+    Returns a benchmark that appends an arithmetic function to a circuit with
+    a query register q (n*ceil(log(k))), count registers b and c
+    (ceil(log(n))+1) and a qubit d.
+    '''
+    def setup(num_slots, colour_amount):
+        logk = int(np.ceil(np.log2(colour_amount)))
+        logn = int(np.ceil(np.log2(num_slots)))
+        registers = (QuantumRegister(num_slots*logk, 'q'), QuantumRegister(logn+1, 'b'),
+                     QuantumRegister(logn+1, 'c'), QuantumRegister(1, 'd'))
+        def run():
+            circuit = QuantumCircuit(*registers)
+            build(circuit, *registers, logk)
+            return circuit
+        return run
+    return setup
+
+
+def _oracle(circuit_name):
+    '''
+    Returns a benchmark that builds an oracle circuit (see resources.CIRCUITS).
+    '''
+    def setup(num_slots, colour_amount):
+        def run():
+            (registers, classical, build) = oracle_registers(circuit_name, num_slots, colour_amount)
+            circuit = QuantumCircuit(*registers, *classical)
+            build(circuit)
+            return circuit
+        return run
+    return setup
+
+
+# Benchmarks by name, each a function (n, k) -> function () -> circuit
+BENCHMARKS = {
+    'qft': _arithmetic(lambda circuit, q, b, c, d, logk: qft(circuit, q)),
+    'iqft': _arithmetic(lambda circuit, q, b, c, d, logk: iqft(circuit, q)),
+    'increment': _arithmetic(lambda circuit, q, b, c, d, logk: increment(circuit, b, amount=3)),
+    'cnincrement': _arithmetic(lambda circuit, q, b, c, d, logk: cnincrement(circuit, q[:logk], b)),
+    'add': _arithmetic(lambda circuit, q, b, c, d, logk: add(circuit, c, b)),
+    'cadd': _arithmetic(lambda circuit, q, b, c, d, logk: cadd(circuit, c, b, d)),
+    'count': _arithmetic(lambda circuit, q, b, c, d, logk: count(circuit, q, b, step=logk)),
+    'compare': _arithmetic(lambda circuit, q, b, c, d, logk: compare(circuit, c, b, d)),
+    'a_oracle': _oracle('a'),
+    'b_oracle_v1': _oracle('b_v1'),
+    'b_oracle_v2': _oracle('b_v2'),
+    'b_oracle_fused': _oracle('b_fused'),
+    'b_oracle_poly': _oracle('b_poly'),
+    'find_colours': _oracle('find_colours'),
+    'find_colour_positions': _oracle('find_colour_positions'),
+    'find_colour_positions_alt': _oracle('find_colour_positions_alt'),
+}
+
+
+def run_benchmark(name, num_slots, colour_amount, repeat=5, basis=BASIS):
+    '''
+    Times building one benchmark circuit.
+
+    Parameters
+    ----------
+    name : Str
+        Name of the benchmark, a key of BENCHMARKS.
+    num_slots : Int
+        Length of the secret.
+    colour_amount : Int
+        Number of colours.
+    repeat : Int
+        Number of builds; the first one is reported separately, since it
+        fills the gate caches.
+    basis : tuple of Str, optional
+        Basis to count the gates in (None for the gates as appended).
+
+    Returns
+    -------
+    result : dict
+        Times (seconds), gate count, CX count, depth and qubits.
+
+    '''
+    run = BENCHMARKS[name](num_slots, colour_amount)
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        circuit = run()
+        times.append(perf_counter() - start)
+    resources = estimate_circuit(circuit, basis)
+    return {
+        'benchmark': name,
+        'num_slots': num_slots,
+        'colour_amount': colour_amount,
+        'first': times[0],
+        'best': min(times),
+        'mean': float(np.mean(times)),
+        'size': resources['size'],
+        'cx': resources['cx'],
+        'depth': resources['depth'],
+        'qubits': resources['qubits'],
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(names, num_slots, colour_amounts, repeat=5, basis=BASIS, verbose=True):
+    '''
+    Runs benchmarks over a grid of MM(n,k), skipping the sizes a circuit
+    does not support (find_colours needs k <= n).
+
+    Returns
+    -------
+    report : dict
+        Environment (commit, python and qiskit versions) and the results.
+
+    '''
+    results = []
+    if verbose:
+        print("%-26s %4s %4s %10s %10s %10s %8s %8s" % ('benchmark', 'n', 'k', 'best (s)', 'first (s)', 'gates', 'cx', 'depth'))
+    for name in names:
+        for n in num_slots:
+            for k in colour_amounts:
+                if name == 'find_colours' and k > n:
+                    continue
+                r = run_benchmark(name, n, k, repeat, basis)
+                results.append(r)
+                if verbose:
+                    print("%-26s %4d %4d %10.5f %10.5f %10d %8d %8d" % (name, n, k, r['best'], r['first'], r['size'],
+                                                                      r['cx'], r['depth']))
+    return {
+        'commit': _commit(),
+        'python': platform.python_version(),
+        'qiskit': qiskit.__version__,
+        'basis': None if basis is None else list(basis),
+        'results': results,
+    }
+
+
+def compare_reports(before, after, threshold=THRESHOLD):
+    '''
+    Compares two reports of run_suite and prints the change of every
+    benchmark both contain.
+
+    Returns
+    -------
+    regressions : list of dict
+        Results of after that are more than threshold (and NOISE seconds)
+        slower (best time) or have more gates than in before.
+
+    '''
+    old = {(r['benchmark'], r['num_slots'], r['colour_amount']): r for r in before['results']}
+    regressions = []
+    print("Comparing %s with %s" % (before.get('commit'), after.get('commit')))
+    print("%-26s %4s %4s %10s %10s %8s %10s %10s" % ('benchmark', 'n', 'k', 'before (s)', 'after (s)', 'ratio', 'gates', 'cx'))
+    for r in after['results']:
+        key = (r['benchmark'], r['num_slots'], r['colour_amount'])
+        if key not in old:
+            continue
+        o = old[key]
+        ratio = r['best']/o['best'] if o['best'] > 0 else float('inf')
+        slower = ratio > 1 + threshold and r['best'] - o['best'] > NOISE
+        regressed = slower or r['size'] > o['size'] or r['cx'] > o['cx']
+        if regressed:
+            regressions.append(r)
+        print("%-26s %4d %4d %10.5f %10.5f %8.2f %+10d %+10d%s" % (*key, o['best'], r['best'], ratio,
+                                                                 r['size'] - o['size'], r['cx'] - o['cx'],
+                                                                 '  <- regression' if regressed else ''))
+    return regressions
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Construction benchmark suite of the arithmetic and oracles.")
+    parser.add_argument('-n', '--num-slots', type=int, nargs='+', default=[2, 3, 4])
+    parser.add_argument('-k', '--colour-amount', type=int, nargs='+', default=[2, 4, 6])
+    parser.add_argument('--benchmarks', nargs='+', default=list(BENCHMARKS), choices=BENCHMARKS)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--no-decompose', action='store_true', help="count the gates as appended")
+    parser.add_argument('--json', default=None, help="write the results to this file")
+    parser.add_argument('--compare', nargs=2, default=None, metavar=('BEFORE', 'AFTER'),
+                        help="compare two result files instead of running")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help="relative slowdown that is a regression")
+    args = parser.parse_args()
+
+    if args.compare is not None:
+        with open(args.compare[0]) as f:
+            before = json.load(f)
+        with open(args.compare[1]) as f:
+            after = json.load(f)
+        regressions = compare_reports(before, after, args.threshold)
+        print("%d regression(s)" % len(regressions))
+        sys.exit(1 if regressions else 0)
+
+    report = run_suite(args.benchmarks, args.num_slots, args.colour_amount, args.repeat,
+                       None if args.no_decompose else BASIS)
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,431 @@
+# -*- coding: utf-8 -*-
+"""
+Classical emulator for circuits that (nearly) stay in the computational basis.
+
+The Mastermind oracles are reversible arithmetic: on a basis-state query the
+X, CX, Toffoli and phase gates only permute basis states or add phases, and
+the only superposition comes from the QFTs inside the Draper adders, which
+spread a few answer qubits at a time. The emulator therefore keeps the state
+as a short list of basis states with their amplitudes instead of a full state
+vector:
+
+    - gates whose matrix is diagonal add a phase to the matching basis states
+      (consecutive ones are evaluated as a single block),
+    - gates whose matrix is anti-diagonal (X, RX(pi), ...) flip a bit,
+    - any other single-qubit gate (H, RX, ...) branches every basis state in
+      two, after which equal basis states are merged and amplitudes that
+      cancelled are dropped.
+
+Controlled gates are handled by their control mask and base gate, every other
+gate by its definition, so the circuit that is emulated is exactly the one the
+circuit builders produce. A circuit is compiled once (keyed by its structure,
+parameters stay symbolic) and every run only binds the parameters.
+
+A run fails with a ValueError when the state spreads over more than max_terms
+basis states; use a state vector simulator for such circuits.
+"""
+import cmath
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from qiskit.circuit import ControlledGate, ParameterExpression
+
+from experiment.qiskit_experiment import circuit_key
+
+
+# Amplitudes (and matrix entries) below this are treated as zero
+TOLERANCE = 1e-9
+
+# Up to this many basis states the state is evaluated in plain python
+SMALL_STATE = 16
+
+# Instructions without effect on the state
+_IGNORED = {'barrier', 'delay', 'id', 'snapshot'}
+
+
+def _is_bound(params):
+    return not any(isinstance(p, ParameterExpression) and p.parameters for p in params)
+
+
+class _Program():
+    '''
+    Compiled form of a circuit: a list of operations on the basis state
+    bits and the measurements at the end of the circuit.
+
+    Operations are tuples:
+        ('phases', masks, values, angles, entries): multiply by exp(i*angle) every
+            basis state with (state & mask) == value, for all entries,
+        ('flip', mask, value, bits): flip bits of the basis states with
+            (state & mask) == value,
+        ('branch', mask, value, qubit, matrix): apply a 2x2 matrix to qubit
+            of the basis states with (state & mask) == value,
+        ('unbound', mask, value, qubit, gate): a single-qubit gate with
+            parameters, resolved to the above when the parameters are bound.
+    '''
+
+    def __init__(self, circuit):
+        if circuit.num_qubits > 62:
+            raise ValueError("The emulator handles at most 62 qubits, not %d" % circuit.num_qubits)
+        self.num_qubits = circuit.num_qubits
+        self.operations = []
+        self.measurements = []
+        self._measured = set()
+
+        # Classical registers, to format the measurement outcomes like qiskit
+        clbits = {clbit: i for (i, clbit) in enumerate(circuit.clbits)}
+        self.registers = [[clbits[clbit] for clbit in register] for register in circuit.cregs]
+
+        qubits = {qubit: i for (i, qubit) in enumerate(circuit.qubits)}
+        for (instruction, qargs, cargs) in circuit.data:
+            targets = [qubits[qubit] for qubit in qargs]
+            if instruction.name == 'measure':
+                self.measurements.append((targets[0], clbits[cargs[0]]))
+                self._measured.add(targets[0])
+            elif instruction.name not in _IGNORED:
+                if self._measured.intersection(targets):
+                    raise ValueError("The emulator only supports measurements at the end of the circuit")
+                self._add(instruction, targets, 0, 0)
+
+        self.operations = _fuse(self.operations)
+        del self._measured
+
+    def _add(self, gate, targets, mask, value):
+        '''
+        Compiles gate on the qubits targets, controlled on (state & mask) == value.
+        '''
+        if gate.name in _IGNORED:
+            return
+        if gate.name in ('measure', 'reset') or gate.num_clbits > 0:
+            raise ValueError("The emulator does not support %s inside a gate" % gate.name)
+
+        # Controlled gate: extend the control mask and compile the base gate
+        # (not for gates with ancillas, e.g. a V-chain MCX, those go by their definition)
+        if isinstance(gate, ControlledGate) and gate.num_qubits == gate.num_ctrl_qubits + gate.base_gate.num_qubits:
+            for (j, qubit) in enumerate(targets[:gate.num_ctrl_qubits]):
+                mask |= 1 << qubit
+                value |= ((gate.ctrl_state >> j) & 1) << qubit
+            return self._add(gate.base_gate, targets[gate.num_ctrl_qubits:], mask, value)
+
+        # Single-qubit gate: by its matrix
+        if len(targets) == 1:
+            if not _is_bound(gate.params):
+                self.operations.append(('unbound', mask, value, targets[0], gate))
+                return
+            matrix = _matrix(gate)
+            if matrix is not None:
+                self.operations.extend(_matrix_operations(matrix, targets[0], mask, value))
+                return
+
+        # Any other gate: by its definition
+        definition = gate.definition
+        if definition is None:
+            raise ValueError("The emulator cannot evaluate gate %s" % gate.name)
+        if mask and definition.global_phase:
+            # Global phase of a controlled definition is a phase on the controls
+            self.operations.append(('phase', mask, value, float(definition.global_phase)))
+        local = {qubit: targets[i] for (i, qubit) in enumerate(definition.qubits)}
+        for (instruction, qargs, _) in definition.data:
+            self._add(instruction, [local[qubit] for qubit in qargs], mask, value)
+
+    def bind(self, binds):
+        '''
+        Returns the operations with all parameters bound to the values in binds.
+        '''
+        operations = []
+        for operation in self.operations:
+            if operation[0] != 'unbound':
+                operations.append(operation)
+                continue
+            (_, mask, value, qubit, gate) = operation
+            gate = gate.copy()
+            gate.params = [_bind(p, binds) for p in gate.params]
+            operations.extend(_fuse(_matrix_operations(_matrix(gate), qubit, mask, value)))
+        return operations
+
+
+def _bind(parameter, binds):
+    if not isinstance(parameter, ParameterExpression):
+        return parameter
+    if parameter in binds:
+        return float(binds[parameter])
+    return float(parameter.bind({k: v for (k, v) in binds.items() if k in parameter.parameters}))
+
+
+def _matrix(gate):
+    try:
+        return np.asarray(gate.to_matrix(), dtype=complex)
+    except Exception:
+        return None
+
+
+def _matrix_operations(matrix, qubit, mask, value):
+    '''
+    Translates a 2x2 matrix on qubit, controlled on (state & mask) == value,
+    into phase, flip or branch operations.
+    '''
+    bit = 1 << qubit
+    operations = []
+    if abs(matrix[0, 1]) < TOLERANCE and abs(matrix[1, 0]) < TOLERANCE:
+        phases = (matrix[0, 0], matrix[1, 1])
+    elif abs(matrix[0, 0]) < TOLERANCE and abs(matrix[1, 1]) < TOLERANCE:
+        operations.append(('flip', mask, value, bit))
+        phases = (matrix[0, 1], matrix[1, 0])
+    else:
+        return [('branch', mask, value, qubit, matrix)]
+
+    # Without controls only the relative phase matters
+    if mask == 0:
+        phases = (1, phases[1]/phases[0])
+    for (outcome, phase) in zip((0, bit), phases):
+        angle = float(np.angle(phase))
+        if abs(angle) > TOLERANCE:
+            operations.append(('phase', mask | bit, value | outcome, angle))
+    return operations
+
+
+def _fuse(operations):
+    '''
+    Merges runs of phase operations into phase blocks and runs of
+    uncontrolled flips into a single flip.
+    '''
+    fused = []
+    for operation in operations:
+        previous = fused[-1] if fused else (None,)
+        if operation[0] == 'phase':
+            if previous[0] != 'phases':
+                previous = ('phases', [], [], [])
+                fused.append(previous)
+            for (entries, entry) in zip(previous[1:], operation[1:]):
+                entries.append(entry)
+        elif operation[0] == 'flip' and operation[1] == 0 and previous[0] == 'flip' and previous[1] == 0:
+            fused[-1] = ('flip', 0, 0, previous[3] ^ operation[3])
+        else:
+            fused.append(operation)
+    # Phase blocks as arrays, plus the entries as tuples for evaluating few states
+    return [('phases', np.array(operation[1], dtype=np.int64), np.array(operation[2], dtype=np.int64),
+             np.array(operation[3]), list(zip(*operation[1:]))) if operation[0] == 'phases' else operation
+            for operation in fused]
+
+
+def _evaluate(operations, max_terms):
+    '''
+    Runs the operations on |0...0> and returns the basis states and their
+    amplitudes.
+
+    While the state holds few basis states it is kept as a dict and updated
+    in plain python, which is faster than numpy for a handful of terms;
+    beyond SMALL_STATE terms it is kept as numpy arrays.
+    '''
+    terms = {0: 1+0j}
+    states = amplitudes = None
+    for operation in operations:
+        if terms is not None and len(terms) > SMALL_STATE:
+            states = np.fromiter(terms.keys(), dtype=np.int64, count=len(terms))
+            amplitudes = np.fromiter(terms.values(), dtype=complex, count=len(terms))
+            terms = None
+        elif terms is None and len(states) <= SMALL_STATE:
+            terms = dict(zip(states.tolist(), amplitudes.tolist()))
+
+        if terms is not None:
+            terms = _apply_to_terms(operation, terms)
+        else:
+            (states, amplitudes) = _apply_to_arrays(operation, states, amplitudes)
+            if len(states) > max_terms:
+                raise ValueError("The state spread over more than %d basis states, "
+                                 "use a state vector simulator for this circuit" % max_terms)
+
+    if terms is not None:
+        return (np.fromiter(terms.keys(), dtype=np.int64, count=len(terms)),
+                np.fromiter(terms.values(), dtype=complex, count=len(terms)))
+    return states, amplitudes
+
+
+def _apply_to_terms(operation, terms):
+    kind = operation[0]
+    if kind == 'phases':
+        result = dict()
+        for (state, amplitude) in terms.items():
+            angle = sum(a for (mask, value, a) in operation[4] if state & mask == value)
+            result[state] = amplitude*cmath.exp(1j*angle) if angle else amplitude
+        return result
+    if kind == 'flip':
+        (_, mask, value, bits) = operation
+        return {(state ^ bits if state & mask == value else state): amplitude
+                for (state, amplitude) in terms.items()}
+
+    (_, mask, value, qubit, matrix) = operation
+    bit = 1 << qubit
+    result = dict()
+    for (state, amplitude) in terms.items():
+        if state & mask != value:
+            result[state] = result.get(state, 0) + amplitude
+            continue
+        current = (state >> qubit) & 1
+        for (outcome, entry) in ((state & ~bit, matrix[0, current]), (state | bit, matrix[1, current])):
+            if entry != 0:
+                result[outcome] = result.get(outcome, 0) + entry*amplitude
+
+    # Drop the amplitudes that cancelled
+    return {state: amplitude for (state, amplitude) in result.items() if abs(amplitude) > TOLERANCE}
+
+
+def _apply_to_arrays(operation, states, amplitudes):
+    kind = operation[0]
+    if kind == 'phases':
+        (_, masks, values, angles, _) = operation
+        match = (states[:, None] & masks) == values
+        return states, amplitudes*np.exp(1j*(match @ angles))
+    if kind == 'flip':
+        (_, mask, value, bits) = operation
+        if mask == 0:
+            return states ^ bits, amplitudes
+        return np.where((states & mask) == value, states ^ bits, states), amplitudes
+
+    (_, mask, value, qubit, matrix) = operation
+    selected = (states & mask) == value
+    bit = 1 << qubit
+    branched = states[selected] & ~bit
+    current = (states[selected] >> qubit) & 1
+    states = np.concatenate((states[~selected], branched, branched | bit))
+    amplitudes = np.concatenate((amplitudes[~selected], matrix[0, current]*amplitudes[selected],
+                                 matrix[1, current]*amplitudes[selected]))
+
+    # Merge equal basis states and drop the amplitudes that cancelled
+    (states, inverse) = np.unique(states, return_inverse=True)
+    amplitudes = (np.bincount(inverse, amplitudes.real, len(states))
+                  + 1j*np.bincount(inverse, amplitudes.imag, len(states)))
+    keep = np.abs(amplitudes) > TOLERANCE
+    return states[keep], amplitudes[keep]
+
+
+class EmulatorResult():
+    '''
+    Counts of the emulated circuits, read like a qiskit Result.
+    '''
+
+    def __init__(self, circuits, counts):
+        self.circuits = circuits
+        self.counts = counts
+
+    def get_counts(self, experiment=None):
+        if experiment is None:
+            return self.counts[0] if len(self.counts) == 1 else self.counts
+        if isinstance(experiment, int):
+            return self.counts[experiment]
+        name = experiment if isinstance(experiment, str) else experiment.name
+        for (circuit, counts) in zip(self.circuits, self.counts):
+            if circuit.name == name:
+                return counts
+        raise KeyError("No counts for experiment %s" % name)
+
+
+class EmulatorJob():
+    '''
+    Finished job of the emulator (the emulator runs synchronously).
+    '''
+
+    def __init__(self, result):
+        self._result = result
+
+    def result(self, timeout=None):
+        return self._result
+
+    def cancel(self):
+        pass
+
+
+class BasisStateEmulator():
+    '''
+    Backend-like classical emulator, see the module docstring.
+
+    Parameters
+    ----------
+    max_terms : Int
+        Maximum number of basis states in superposition.
+    cache_size : Int
+        Number of compiled circuits to keep.
+    seed : Int, optional
+        Seed for sampling the measurements.
+    '''
+
+    def __init__(self, max_terms=2**16, cache_size=64, seed=None):
+        self.max_terms = max_terms
+        self.cache_size = cache_size
+        self._programs = OrderedDict()
+        self._lock = threading.Lock()
+        self._rng = np.random.default_rng(seed)
+
+    def name(self):
+        return 'basis_state_emulator'
+
+    def compile(self, circuit):
+        '''
+        Returns the compiled circuit, compiling it if not cached yet. Circuits
+        are cached by circuit_key, which includes the definitions of their
+        composite gates, since those are what gets compiled.
+        '''
+        key = circuit_key(circuit)
+        with self._lock:
+            if key in self._programs:
+                self._programs.move_to_end(key)
+                program = self._programs[key]
+            else:
+                program = _Program(circuit)
+                self._programs[key] = program
+                if len(self._programs) > self.cache_size:
+                    self._programs.popitem(last=False)
+        return program
+
+    def run(self, circuits, shots=1, parameter_binds=None):
+        '''
+        Emulates one or more circuits.
+
+        Parameters
+        ----------
+        circuits : QuantumCircuit or list of QuantumCircuit
+            Circuits to run, measured at the end.
+        shots : Int
+            Number of samples per circuit (and binding).
+        parameter_binds : list of dict, optional
+            Parameter values; every circuit is run once per binding.
+
+        Returns
+        -------
+        job : EmulatorJob
+
+        '''
+        if not isinstance(circuits, (list, tuple)):
+            circuits = [circuits]
+
+        experiments = []
+        counts = []
+        for circuit in circuits:
+            program = self.compile(circuit)
+            for binds in (parameter_binds or [dict()]):
+                experiments.append(circuit)
+                counts.append(self._sample(program, program.bind(binds), shots))
+        return EmulatorJob(EmulatorResult(experiments, counts))
+
+    def _sample(self, program, operations, shots):
+        (states, amplitudes) = _evaluate(operations, self.max_terms)
+
+        # Classical bit values of every basis state, and their probabilities
+        outcomes = np.zeros(len(states), dtype=np.int64)
+        for (qubit, clbit) in program.measurements:
+            outcomes = (outcomes & ~(1 << clbit)) | (((states >> qubit) & 1) << clbit)
+        (outcomes, inverse) = np.unique(outcomes, return_inverse=True)
+        probabilities = np.bincount(inverse, np.abs(amplitudes)**2, len(outcomes))
+
+        if len(outcomes) == 1:
+            samples = [shots]
+        else:
+            samples = self._rng.multinomial(shots, probabilities/probabilities.sum())
+        return {self._format(program, int(outcome)): int(count)
+                for (outcome, count) in zip(outcomes, samples) if count > 0}
+
+    @staticmethod
+    def _format(program, outcome):
+        # Like qiskit: last register first, most significant bit first
+        return ' '.join(''.join(str((outcome >> clbit) & 1) for clbit in reversed(register))
+                        for register in reversed(program.registers))
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+Local stand-in for a remote backend.
+
+Runs the circuits on a local backend, but every job only finishes latency
+seconds (plus random jitter) after it was submitted and fails with
+probability failure_rate, like a job at Quantum Inspire or IBMQ would. Use it
+to test the asynchronous interface of QiskitExperiment without the network:
+
+    experiment = QiskitExperiment(LatencyBackend(Aer.get_backend('qasm_simulator'), latency=0.5))
+"""
+from time import monotonic, sleep
+
+import numpy as np
+from qiskit.providers.exceptions import JobError, JobTimeoutError
+
+
+class LatencyJob():
+    '''
+    Job of a LatencyBackend.
+    '''
+
+    def __init__(self, job, ready_at, fails):
+        self.job = job
+        self.ready_at = ready_at
+        self.fails = fails
+
+    def result(self, timeout=None):
+        wait = self.ready_at - monotonic()
+        if timeout is not None and wait > timeout:
+            sleep(timeout)
+            raise JobTimeoutError("Job did not finish within %.3f s" % timeout)
+        sleep(max(0, wait))
+        if self.fails:
+            raise JobError("Injected job failure")
+        return self.job.result()
+
+    def cancel(self):
+        pass
+
+
+class LatencyBackend():
+    '''
+    Wraps backend, delaying (and possibly failing) every job.
+
+    Parameters
+    ----------
+    backend : backend
+        Local backend to run the circuits on.
+    latency : Float
+        Seconds between submitting a job and its result.
+    jitter : Float
+        Standard deviation of the latency in seconds.
+    failure_rate : Float
+        Probability that a job fails.
+    seed : Int, optional
+        Seed for the jitter and failures.
+    '''
+
+    def __init__(self, backend, latency=0.5, jitter=0.0, failure_rate=0.0, seed=None):
+        self.backend = backend
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._rng = np.random.default_rng(seed)
+
+    def name(self):
+        name = self.backend.name
+        return 'latency_%s' % (name() if callable(name) else name)
+
+    def configuration(self):
+        return self.backend.configuration()
+
+    def run(self, *args, **kwargs):
+        latency = max(0.0, self.latency + self.jitter*self._rng.standard_normal())
+        fails = self._rng.random() < self.failure_rate
+        return LatencyJob(self.backend.run(*args, **kwargs), monotonic() + latency, fails)
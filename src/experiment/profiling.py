@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+Phase-level profiling of the games and experiments.
+
+The games and QiskitExperiment mark their phases (solver logic, circuit
+building, transpiling, execution, result parsing) with
+
+    with phase('transpile'):
+        ...
+
+or the @profiled decorator. Nothing is measured until a sink is added, so
+the phases cost next to nothing by default:
+
+    counters = CounterSink()
+    add_sink(counters)
+    game.play(secret)
+    print(counters)
+
+Sinks can be added and removed at any time. Phases nest: every record has
+the path of the enclosing phases (e.g. do_move/check_input/run/execute).
+Setting MASTERMIND_PROFILE installs sinks at import, as a comma separated
+list of 'counters' (printed at exit), 'jsonl:<file>' and 'cprofile:<file>'.
+"""
+import atexit
+import cProfile
+import json
+import os
+import sys
+import threading
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from time import perf_counter, time
+
+# Sinks that receive the phases, see add_sink
+_SINKS = []
+_SINKS_LOCK = threading.Lock()
+
+# Stack of enclosing phases, per thread
+_STACK = threading.local()
+
+# Context of a phase while no sink is installed
+_DISABLED = nullcontext()
+
+# Sinks to install at import
+PROFILE = os.getenv('MASTERMIND_PROFILE')
+
+
+class Sink():
+    '''
+    Receives the phases. enter is called when a phase starts and record
+    when it ends.
+    '''
+
+    def enter(self, name, path, tags):
+        pass
+
+    def record(self, name, path, duration, tags):
+        pass
+
+    def close(self):
+        pass
+
+
+class CounterSink(Sink):
+    '''
+    Keeps the number of calls and the total, minimum and maximum duration of
+    every phase (by path) in memory.
+    '''
+
+    def __init__(self):
+        self.counters = dict()
+        self._lock = threading.Lock()
+
+    def record(self, name, path, duration, tags):
+        with self._lock:
+            counter = self.counters.get(path)
+            if counter is None:
+                self.counters[path] = [1, duration, duration, duration]
+            else:
+                counter[0] += 1
+                counter[1] += duration
+                counter[2] = min(counter[2], duration)
+                counter[3] = max(counter[3], duration)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+
+    def summary(self):
+        '''
+        Returns the counters as a dict of path -> dict with calls, total,
+        mean, min and max (seconds).
+        '''
+        with self._lock:
+            return {path: {'calls': calls, 'total': total, 'mean': total/calls, 'min': low, 'max': high}
+                    for (path, (calls, total, low, high)) in sorted(self.counters.items())}
+
+    def __str__(self):
+        lines = ["%-60s %8s %10s %10s %10s" % ('phase', 'calls', 'total (s)', 'mean (ms)', 'max (ms)')]
+        for (path, c) in self.summary().items():
+            lines.append("%-60s %8d %10.4f %10.4f %10.4f" % (path, c['calls'], c['total'], c['mean']*1000,
+                                                             c['max']*1000))
+        return "\n".join(lines)
+
+
+class JSONLinesSink(Sink):
+    '''
+    Appends every phase as a line of JSON (name, path, start time, duration,
+    thread and tags) to a file.
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'a')
+        self._lock = threading.Lock()
+
+    def record(self, name, path, duration, tags):
+        line = json.dumps({'name': name, 'path': path, 'start': time() - duration, 'duration': duration,
+                           'thread': threading.current_thread().name, **tags}, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class CProfileSink(Sink):
+    '''
+    Runs cProfile during the outermost phases (or only the phases named in
+    names) to see which functions a phase spends its time in.
+
+    Parameters
+    ----------
+    names : list of Str, optional
+        Phases to profile. The default profiles every outermost phase.
+    path : Str, optional
+        File to dump the statistics to on close (see pstats).
+    '''
+
+    def __init__(self, names=None, path=None):
+        self.names = None if names is None else set(names)
+        self.path = path
+        self.profile = cProfile.Profile()
+        self._depth = 0
+
+    def _selected(self, name, path):
+        return name in self.names if self.names is not None else '/' not in path
+
+    def enter(self, name, path, tags):
+        # cProfile only profiles a single thread
+        if threading.current_thread() is threading.main_thread() and self._selected(name, path):
+            if self._depth == 0:
+                self.profile.enable()
+            self._depth += 1
+
+    def record(self, name, path, duration, tags):
+        if threading.current_thread() is threading.main_thread() and self._selected(name, path):
+            self._depth -= 1
+            if self._depth == 0:
+                self.profile.disable()
+
+    def stats(self):
+        '''
+        Returns the statistics as a pstats.Stats.
+        '''
+        import pstats
+        return pstats.Stats(self.profile)
+
+    def close(self):
+        if self.path is not None:
+            self.profile.dump_stats(self.path)
+
+
+class PyinstrumentSink(CProfileSink):
+    '''
+    Like CProfileSink, with the pyinstrument sampling profiler (which must be
+    installed).
+    '''
+
+    def __init__(self, names=None, path=None):
+        from pyinstrument import Profiler
+        super(PyinstrumentSink, self).__init__(names, path)
+        self.profile = Profiler()
+
+    def enter(self, name, path, tags):
+        if threading.current_thread() is threading.main_thread() and self._selected(name, path):
+            if self._depth == 0:
+                self.profile.start()
+            self._depth += 1
+
+    def record(self, name, path, duration, tags):
+        if threading.current_thread() is threading.main_thread() and self._selected(name, path):
+            self._depth -= 1
+            if self._depth == 0:
+                self.profile.stop()
+
+    def stats(self):
+        return self.profile.output_text()
+
+    def close(self):
+        if self.path is not None:
+            with open(self.path, 'w') as f:
+                f.write(self.profile.output_html())
+
+
+def add_sink(sink):
+    '''
+    Starts sending the phases to sink (and returns it).
+    '''
+    global _SINKS
+    with _SINKS_LOCK:
+        _SINKS = _SINKS + [sink]
+    return sink
+
+
+def remove_sink(sink, close=True):
+    '''
+    Stops sending the phases to sink and closes it. Profiling is disabled
+    again once every sink is removed.
+    '''
+    global _SINKS
+    with _SINKS_LOCK:
+        _SINKS = [s for s in _SINKS if s is not sink]
+    if close:
+        sink.close()
+
+
+def enabled():
+    '''
+    Returns whether any sink is installed.
+    '''
+    return bool(_SINKS)
+
+
+@contextmanager
+def _measure(sinks, name, tags):
+    stack = getattr(_STACK, 'names', None)
+    if stack is None:
+        stack = _STACK.names = []
+    stack.append(name)
+    path = "/".join(stack)
+    for sink in sinks:
+        sink.enter(name, path, tags)
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        duration = perf_counter() - start
+        stack.pop()
+        for sink in sinks:
+            sink.record(name, path, duration, tags)
+
+
+def phase(name, **tags):
+    '''
+    Returns a context manager marking a phase. Does nothing while no sink is
+    installed.
+
+    Parameters
+    ----------
+    name : Str
+        Name of the phase.
+    **tags :
+        Extra information passed on to the sinks (e.g. the number of
+        circuits).
+    '''
+    sinks = _SINKS
+    if not sinks:
+        return _DISABLED
+    return _measure(sinks, name, tags)
+
+
+def profiled(name):
+    '''
+    Decorator marking every call of a function as a phase.
+    '''
+    def decorator(function):
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            sinks = _SINKS
+            if not sinks:
+                return function(*args, **kwargs)
+            with _measure(sinks, name, dict()):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _install(profile):
+    '''
+    Installs the sinks named in profile (see MASTERMIND_PROFILE).
+    '''
+    for spec in profile.split(','):
+        (kind, _, path) = spec.strip().partition(':')
+        if kind == 'counters':
+            counters = add_sink(CounterSink())
+            atexit.register(lambda: print(counters, file=sys.stderr))
+        elif kind == 'jsonl':
+            sink = add_sink(JSONLinesSink(path or 'mastermind_profile.jsonl'))
+            atexit.register(sink.close)
+        elif kind == 'cprofile':
+            sink = add_sink(CProfileSink(path=path or 'mastermind.prof'))
+            atexit.register(sink.close)
+        elif kind:
+            raise ValueError("Unknown profiling sink %s, choose counters, jsonl or cprofile" % kind)
+
+
+if PROFILE:
+    _install(PROFILE)
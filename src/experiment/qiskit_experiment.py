@@ -1,9 +1,22 @@
 """
 This class can be used as a basic framework for a Qiskit Experiment.
 """
-from qiskit import execute, Aer, IBMQ
+import asyncio
+import configparser
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+
+import numpy as np
+from qiskit import transpile, Aer, IBMQ
+from qiskit.circuit import ControlledGate, Gate, Instruction, ParameterExpression
+from qiskit.providers.exceptions import JobError, JobTimeoutError
 from quantuminspire.qiskit import QI
 
+from experiment.latency_backend import LatencyBackend
+from experiment.profiling import phase
+
 __author__ = "Maarten Lips"
 
 import os
@@ -14,6 +27,38 @@ from quantuminspire.credentials import load_account, get_token_authentication, g
 QI_EMAIL = os.getenv('QI_EMAIL')
 QI_PASSWORD = os.getenv('QI_PASSWORD')
 QI_URL = os.getenv('API_URL', 'https://api.quantum-inspire.com/')
+IBMQ_TOKEN = os.getenv('IBMQ_TOKEN')
+
+# Backend to use when none is passed (LOCAL, IBMQ, QI or CLASSICAL); if
+# neither this nor the config file sets one, the user is asked for it.
+MASTERMIND_BACKEND = os.getenv('MASTERMIND_BACKEND')
+
+# Config file with an [experiment] section, e.g. "backend = LOCAL"
+CONFIG_FILE = os.getenv('MASTERMIND_CONFIG', os.path.join(os.path.expanduser('~'), '.config', 'mastermind', 'experiment.ini'))
+
+BACKENDS = ('LOCAL', 'IBMQ', 'QI', 'CLASSICAL')
+
+# Maximum number of transpiled circuits kept in the transpile cache
+TRANSPILE_CACHE_SIZE = int(os.getenv('TRANSPILE_CACHE_SIZE', 64))
+
+# Jobs an experiment keeps in flight at once, how often a failed (or timed
+# out) job is resubmitted and how many seconds to wait for a job (None: no limit)
+MAX_JOBS = int(os.getenv('MASTERMIND_MAX_JOBS', 4))
+JOB_RETRIES = int(os.getenv('MASTERMIND_JOB_RETRIES', 2))
+JOB_TIMEOUT = float(os.getenv('MASTERMIND_JOB_TIMEOUT')) if os.getenv('MASTERMIND_JOB_TIMEOUT') else None
+RETRY_DELAY = 1.0
+
+# Errors after which a job is resubmitted
+RETRY_ERRORS = (JobError, JobTimeoutError, ConnectionError, TimeoutError)
+
+# Backends already set up in this process, by name, and a lock per name
+# held while setting it up (which may ask for credentials)
+_BACKENDS = dict()
+_SETUP_LOCKS = dict()
+_BACKENDS_LOCK = threading.RLock()
+
+# Name prefix of the threads waiting on submitted jobs
+_THREAD_PREFIX = 'experiment'
 
 def get_authentication(B):
     if B == 'QI':
@@ -31,8 +76,11 @@ def get_authentication(B):
                 email, password = QI_EMAIL, QI_PASSWORD
             return get_basic_authentication(email, password)
     elif B == 'IBMQ':
-        print('Enter IBMQ token:')
-        ibmq_token = input()
+        if IBMQ_TOKEN is None:
+            print('Enter IBMQ token:')
+            ibmq_token = input()
+        else:
+            ibmq_token = IBMQ_TOKEN
         return IBMQ.enable_account(ibmq_token)
 
 def _setup(B):
@@ -47,27 +95,394 @@ def _setup(B):
     elif B == 'IBMQ':
         provider = get_authentication(B)
         sim_backend = provider.get_backend('ibmq_qasm_simulator')
+        
+    elif B == 'CLASSICAL':
+        from experiment.basis_emulator import BasisStateEmulator
+        sim_backend = BasisStateEmulator()
     return sim_backend
 
 
-class QiskitExperiment():        
-    def __init__(self):
-        print('\n\nChoose backend:')
-        print('LOCAL: local qasm simulator,')
-        print('IBMQ: qasm simulator at IBMQ,')
-        print('QI: QX single-node qasm simulator at Quantum Inspire')
-        while True:
+def read_config(config_file=None):
+    '''
+    Returns the [experiment] section of the config file as a dict (empty if
+    there is no such file or section).
+    '''
+    parser = configparser.ConfigParser()
+    parser.read(CONFIG_FILE if config_file is None else config_file)
+    return dict(parser['experiment']) if parser.has_section('experiment') else dict()
+
+
+def _ask_backend():
+    print('\n\nChoose backend:')
+    print('LOCAL: local qasm simulator,')
+    print('IBMQ: qasm simulator at IBMQ,')
+    print('QI: QX single-node qasm simulator at Quantum Inspire,')
+    print('CLASSICAL: local classical emulator (basis-state queries only)')
+    while True:
+        backend = str(input())
+        if backend in BACKENDS:
+            return backend
+        print('Please choose LOCAL, IBMQ, QI or CLASSICAL')
+
+
+def choose_backend(backend=None, config_file=None):
+    '''
+    Resolves the name of the backend: the given name, else the
+    MASTERMIND_BACKEND environment variable, else the config file and only
+    if none of these set it, asks the user.
+    '''
+    if backend is None:
+        backend = MASTERMIND_BACKEND
+    if backend is None:
+        backend = read_config(config_file).get('backend')
+    if backend is None:
+        if threading.current_thread().name.startswith(_THREAD_PREFIX):
+            raise RuntimeError("No backend chosen; set one before submitting jobs")
+        return _ask_backend()
+    
+    backend = backend.upper()
+    if backend not in BACKENDS:
+        raise ValueError("Unknown backend %s, choose one of %s" % (backend, ", ".join(BACKENDS)))
+    return backend
+
+
+def get_backend(name):
+    '''
+    Returns the backend called name, set up (and authenticated) once per
+    process and shared by all experiments.
+    '''
+    with _BACKENDS_LOCK:
+        if name in _BACKENDS:
+            return _BACKENDS[name]
+        lock = _SETUP_LOCKS.setdefault(name, threading.Lock())
+    
+    # Only jobs on this backend wait for its set up
+    with lock:
+        if name not in _BACKENDS:
+            backend = _setup(name)
+            with _BACKENDS_LOCK:
+                _BACKENDS[name] = backend
+    return _BACKENDS[name]
+
+
+def _backend_name(backend):
+    name = backend.name
+    return name() if callable(name) else name
+
+
+def _max_experiments(backend):
+    # Maximum number of circuits per job, None if the backend sets no limit
+    try:
+        return getattr(backend.configuration(), 'max_experiments', None)
+    except AttributeError:
+        return None
+
+
+def _param_key(param):
+    if isinstance(param, ParameterExpression):
+        return param
+    if isinstance(param, np.ndarray):
+        return (param.dtype.str, param.shape, param.tobytes())
+    return str(param)
+
+
+# Instructions whose behaviour is given by their definition rather than by
+# their class (e.g. the result of to_gate, to_instruction or control)
+_DEFINED = (Instruction, Gate, ControlledGate)
+
+
+def _instruction_key(instruction, definitions):
+    definition = None
+    if type(instruction) in _DEFINED:
+        circuit = instruction.definition
+        if circuit is not None:
+            # Gates are often appended many times, so key every definition
+            # once (keeping the circuit, so that its id is not reused)
+            if id(circuit) not in definitions:
+                definitions[id(circuit)] = (circuit, _structure(circuit, definitions))
+            definition = definitions[id(circuit)][1]
+        kind = None
+    else:
+        kind = (type(instruction).__module__, type(instruction).__qualname__)
+    return (instruction.name, kind, instruction.num_qubits, instruction.num_clbits,
+            tuple(_param_key(p) for p in instruction.params), definition)
+
+
+def _structure(circuit, definitions):
+    qubits = {qubit: i for (i, qubit) in enumerate(circuit.qubits)}
+    clbits = {clbit: i for (i, clbit) in enumerate(circuit.clbits)}
+    registers = tuple((register.name, register.size) for register in circuit.qregs + circuit.cregs)
+    instructions = tuple((_instruction_key(instruction, definitions),
+                          tuple(qubits[q] for q in qargs), tuple(clbits[c] for c in cargs))
+                         for (instruction, qargs, cargs) in circuit.data)
+    return (registers, instructions)
+
+
+def circuit_key(circuit):
+    '''
+    Returns the structure of a circuit as a (hashable) tuple: its registers
+    and, for every instruction, the name, parameters, the bits it acts on and,
+    for composite gates, the structure of their definition. Two circuits with
+    the same key transpile to the same circuit. Unbound parameters count by
+    identity, not by name, since the bindings refer to the objects.
+    '''
+    return _structure(circuit, dict())
+
+
+class TranspileCache():
+    '''
+    LRU cache of transpiled circuits, keyed by circuit structure, backend
+    and optimization level.
+    '''
+    
+    def __init__(self, maxsize=TRANSPILE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._circuits = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def transpile(self, circuit, backend, optimization):
+        key = (circuit_key(circuit), _backend_name(backend), optimization)
+        with self._lock:
+            if key in self._circuits:
+                self.hits += 1
+                self._circuits.move_to_end(key)
+                return self._circuits[key]
+            self.misses += 1
+        
+        transpiled = transpile(circuit, backend=backend, optimization_level=optimization)
+        with self._lock:
+            self._circuits[key] = transpiled
+            if len(self._circuits) > self.maxsize:
+                self._circuits.popitem(last=False)
+        return transpiled
+    
+    def clear(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self._circuits.clear()
+
+
+# Process-wide transpile cache, shared by all experiments
+transpile_cache = TranspileCache()
+
+
+class QiskitExperiment():
+    '''
+    Runs circuits on a simulator backend. The backend is only chosen (see
+    choose_backend) and set up when the first circuit is run.
+    
+    Every run blocks until its result is in; submit and submit_batch return
+    a concurrent.futures.Future instead (run_async and run_batch_async an
+    awaitable), so that many jobs can be in flight at once.
+    
+    Parameters
+    ----------
+    backend : Str or backend, optional
+        Name of the backend (LOCAL, IBMQ, QI or CLASSICAL) or a backend
+        instance to use as is.
+    config_file : Str, optional
+        Config file to read the backend from. The default is CONFIG_FILE.
+    max_jobs : Int
+        Maximum number of submitted jobs in flight at once.
+    retries : Int
+        Number of times a failed or timed out job is resubmitted.
+    timeout : Float, optional
+        Seconds to wait for the result of a job. The default waits forever.
+    '''
+    
+    def __init__(self, backend=None, config_file=None, max_jobs=MAX_JOBS, retries=JOB_RETRIES, timeout=JOB_TIMEOUT):
+        self.config_file = config_file
+        if backend is None or isinstance(backend, str):
+            self.backend = backend
+            self._sim_backend = None
+        else:
+            self.backend = _backend_name(backend)
+            self._sim_backend = backend
+        self.max_jobs = max_jobs
+        self.retries = retries
+        self.timeout = timeout
+        self._executor = None
+    
+    @property
+    def sim_backend(self):
+        if self._sim_backend is None:
+            # Resolve the name (which may ask the user) before taking any lock
+            name = choose_backend(self.backend, self.config_file)
+            backend = get_backend(name)
+            with _BACKENDS_LOCK:
+                if self._sim_backend is None:
+                    (self.backend, self._sim_backend) = (name, backend)
+        return self._sim_backend
+    
+    @sim_backend.setter
+    def sim_backend(self, backend):
+        self._sim_backend = backend
+    
+    def __getstate__(self):
+        # Pickle named backends by name, every process sets up its own
+        state = self.__dict__.copy()
+        if self.backend in BACKENDS:
+            state['_sim_backend'] = None
+        state['_executor'] = None
+        return state
+    
+    def _emulated(self):
+        # The classical emulator evaluates the circuit as built, without transpiling
+        from experiment.basis_emulator import BasisStateEmulator
+        backend = self.sim_backend
+        if isinstance(backend, LatencyBackend):
+            backend = backend.backend
+        return isinstance(backend, BasisStateEmulator)
+    
+    def _transpile(self, circuit, optimization):
+        # Transpile once per circuit structure (for the backend a stand-in wraps)
+        backend = self.sim_backend
+        if isinstance(backend, LatencyBackend):
+            backend = backend.backend
+        with phase('transpile'):
+            transpiled = transpile_cache.transpile(circuit, backend, optimization)
+        # Results are looked up by the name of the circuit that was run
+        if transpiled.name != circuit.name:
+            transpiled = transpiled.copy(name=circuit.name)
+        return transpiled
+    
+    def _result(self, job):
+        if self.timeout is None:
+            return job.result()
+        try:
+            return job.result(timeout=self.timeout)
+        except JobTimeoutError:
+            try:
+                job.cancel()
+            except Exception:
+                pass
+            raise
+    
+    def _retry(self, function, *args):
+        # Resubmit on job failures and time outs, waiting longer every time
+        for attempt in range(self.retries + 1):
             try:
-                backend = str(input())
-                if backend == 'LOCAL' or backend == 'QI' or backend == 'IBMQ':
-                    self.sim_backend = _setup(backend)
-                else:
-                    raise ValueError
-                break
-            except ValueError:
-                print('Please choose LOCAL, IBMQ or QI')
+                return function(*args)
+            except RETRY_ERRORS:
+                if attempt == self.retries:
+                    raise
+                sleep(RETRY_DELAY*2**attempt)
+
+    def run(self, circuit, shots, optimization=1, parameter_binds=None):
+        with phase('run'):
+            return self._retry(self._run, circuit, shots, optimization, parameter_binds)
+    
+    def _run(self, circuit, shots, optimization, parameter_binds):
+        if self._emulated():
+            with phase('execute'):
+                return self._result(self.sim_backend.run(circuit, shots, parameter_binds))
         
+        # Parameters are bound after transpiling
+        transpiled = self._transpile(circuit, optimization)
+        
+        # Parameterised circuits are run once per binding (one experiment each)
+        if parameter_binds is not None:
+            with phase('bind', experiments=len(parameter_binds)):
+                transpiled = [transpiled.bind_parameters(binds) for binds in parameter_binds]
+        with phase('execute'):
+            qi_job = self.sim_backend.run(transpiled, shots=shots)
+            return self._result(qi_job)
+    
+    def run_batch(self, circuits, shots, optimization=1, parameter_binds=None):
+        '''
+        Runs many circuits as a single job (or as few jobs as the backend
+        allows), instead of one job per circuit.
+
+        Parameters
+        ----------
+        circuits : list of QuantumCircuit
+            Circuits to run.
+        shots : Int
+            Number of shots per circuit.
+        optimization : Int
+            Transpiler optimization level.
+        parameter_binds : list of dict, optional
+            Parameter values for every circuit (None for a circuit without
+            parameters).
+
+        Returns
+        -------
+        counts : list of dict
+            Counts of every circuit, in the order of circuits.
 
-    def run(self, circuit, shots, optimization=1):
-        qi_job = execute(circuit, backend=self.sim_backend, shots=shots, optimization_level=optimization)
-        return qi_job.result()
+        '''
+        with phase('run_batch', circuits=len(circuits)):
+            return self._retry(self._run_batch, circuits, shots, optimization, parameter_binds)
+    
+    def _run_batch(self, circuits, shots, optimization, parameter_binds):
+        if parameter_binds is None:
+            parameter_binds = [None]*len(circuits)
+        
+        # The classical emulator has no job overhead, run the circuits one by one
+        if self._emulated():
+            with phase('execute'):
+                return [self._result(self.sim_backend.run(circuit, shots, None if binds is None else [binds])).get_counts(0)
+                        for (circuit, binds) in zip(circuits, parameter_binds)]
+        
+        experiments = []
+        for (circuit, binds) in zip(circuits, parameter_binds):
+            transpiled = self._transpile(circuit, optimization)
+            experiments.append(transpiled if binds is None else transpiled.bind_parameters(binds))
+        
+        # Submit every job before waiting for any of them
+        size = _max_experiments(self.sim_backend) or max(1, len(experiments))
+        batches = [experiments[start:start + size] for start in range(0, len(experiments), size)]
+        with phase('execute', jobs=len(batches)):
+            jobs = [self.sim_backend.run(batch, shots=shots) for batch in batches]
+            counts = []
+            for (batch, job) in zip(batches, jobs):
+                result = self._result(job)
+                counts.extend(result.get_counts(i) for i in range(len(batch)))
+        return counts
+    
+    def _submit(self, function, *args):
+        # Choose the backend on the calling thread, never in the worker threads
+        self.sim_backend
+        if self._executor is None:
+            with _BACKENDS_LOCK:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(self.max_jobs, thread_name_prefix=_THREAD_PREFIX)
+        return self._executor.submit(function, *args)
+    
+    def submit(self, circuit, shots, optimization=1, parameter_binds=None):
+        '''
+        Like run, but returns at once with a concurrent.futures.Future of
+        the result. At most max_jobs jobs run at the same time, the others
+        wait their turn.
+        '''
+        return self._submit(self.run, circuit, shots, optimization, parameter_binds)
+    
+    def submit_batch(self, circuits, shots, optimization=1, parameter_binds=None):
+        '''
+        Like run_batch, but returns at once with a concurrent.futures.Future
+        of the counts.
+        '''
+        return self._submit(self.run_batch, circuits, shots, optimization, parameter_binds)
+    
+    async def run_async(self, circuit, shots, optimization=1, parameter_binds=None):
+        '''
+        Like run, awaitable from asyncio.
+        '''
+        return await asyncio.wrap_future(self.submit(circuit, shots, optimization, parameter_binds))
+    
+    async def run_batch_async(self, circuits, shots, optimization=1, parameter_binds=None):
+        '''
+        Like run_batch, awaitable from asyncio.
+        '''
+        return await asyncio.wrap_future(self.submit_batch(circuits, shots, optimization, parameter_binds))
+    
+    def close(self):
+        '''
+        Waits for the submitted jobs and stops the threads waiting on them.
+        '''
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
@@ -1,5 +1,6 @@
 import tkinter as tk
 
+from mastermind.game.algorithms.strategies import STRATEGIES
 from mastermind.game.textgame import TextClassical, TextKnuth, TextBuhrman, TextQnuth, TextQuantum
 from mastermind.game.visual.visual_mastermind import GameView
 
@@ -10,6 +11,7 @@ def _choose_game():
     print("3. Knuth (Classical Algorithm)")
     print("4. Qnuth (Knuth vs Quantum)")
     print("5. Buhrman (Quantum Algorithm)")
+    print("6. Other strategy (Classical Algorithm)")
 
     while True:
         try:
@@ -24,11 +26,28 @@ def _choose_game():
                 TextQnuth()
             elif game_type == 5:
                 TextBuhrman()
+            elif game_type == 6:
+                TextKnuth(strategy=_choose_strategy())
             else:
                 raise ValueError
             break
         except ValueError:
-            print("Please fill in a number between 1 and 5")
+            print("Please fill in a number between 1 and 6")
+
+
+def _choose_strategy():
+    print("\n\nChoose how the solver scores its moves:")
+    for (i, strategy) in enumerate(STRATEGIES):
+        print("%d. %s" % (i + 1, strategy))
+
+    while True:
+        try:
+            choice = int(input())
+            if not 1 <= choice <= len(STRATEGIES):
+                raise ValueError
+            return STRATEGIES[choice - 1]
+        except ValueError:
+            print("Please fill in a number between 1 and %d" % len(STRATEGIES))
 
 
 def _choose_interface():
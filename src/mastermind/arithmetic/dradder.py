@@ -8,8 +8,8 @@ implements positive integer addition and subtraction functions based on a Draper
 
 from math import pi
 from qiskit import *
-from qiskit.circuit.library.standard_gates import PhaseGate
-from mastermind.arithmetic.qft import qft, iqft
+from mastermind.arithmetic.gates import append_mcphase
+from mastermind.arithmetic.qft import qft, iqft, fourier_order
 
 
 def add(circuit, a, b, do_qft=True, amount=1):
@@ -48,10 +48,11 @@ def add(circuit, a, b, do_qft=True, amount=1):
         qft(circuit, b)
         circuit.barrier()
     
-    # Actual add loop
+    # Actual add loop (on b in Fourier basis order)
+    fb = fourier_order(b)
     for i in range(na):
         for j in range(nb-i):
-            circuit.cp(amount*pi/2**(nb-i-j-1), a[i], b[j])
+            circuit.cp(amount*pi/2**(nb-i-j-1), a[i], fb[j])
     
     # Optional iQFT
     if do_qft:
@@ -119,7 +120,6 @@ def cadd(circuit, a, b, c, do_qft=True, amount=1):
     
     na = len(a) 
     nb = len(b)
-    nc = len(c)
     
     if do_qft:
         circuit.barrier()
@@ -129,10 +129,10 @@ def cadd(circuit, a, b, c, do_qft=True, amount=1):
     # Actual add loop
     
     ### OPTION 1: using standard gates; nicest printing result (als enable import statement at top of file)
+    fb = fourier_order(b)
     for i in range(na):
         for j in range(nb-i):
-            ncp = PhaseGate(amount*pi/2**(nb-i-j-1)).control(nc+1)
-            circuit.append(ncp, [*c, a[i], b[j]])
+            append_mcphase(circuit, amount*pi/2**(nb-i-j-1), [*c, a[i]], fb[j])
     
     ### OPTION 2: using individual gate circuits
     # for i in range(na):
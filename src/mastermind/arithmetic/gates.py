@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+Shared library of the gates the arithmetic appends over and over.
+
+Building a multi-controlled gate (and later its definition) is expensive, while
+the oracles need the same few (angle, number of controls) combinations
+thousands of times, so every gate is built once and reused.
+
+Multi-controlled gates can also borrow qubits from an AncillaPool (see
+set_ancilla_pool) and decompose into a V-chain of Toffolis, which needs far
+fewer CX gates than the ancilla-free constructions once there are more than
+a few controls.
+"""
+from functools import lru_cache
+from qiskit.circuit.library.standard_gates import PhaseGate
+
+# Maximum number of different gates kept
+GATE_CACHE_SIZE = 1024
+
+# Pool the multi-controlled gates borrow ancillas from, see set_ancilla_pool
+_ANCILLAS = None
+
+
+@lru_cache(maxsize=GATE_CACHE_SIZE)
+def mcphase(angle, num_controls):
+    '''
+    Returns the phase gate P(angle) controlled by num_controls qubits.
+
+    Parameters
+    ----------
+    angle : float
+        Phase angle.
+    num_controls : int
+        Number of control qubits (0 for an uncontrolled phase gate).
+
+    Returns
+    -------
+    gate : Gate
+        Gate on num_controls + 1 qubits, the controls first.
+
+    '''
+    gate = PhaseGate(angle)
+    return gate.control(num_controls) if num_controls > 0 else gate
+
+
+class AncillaPool():
+    '''
+    Qubits multi-controlled gates may borrow as ancillas.
+
+    Clean ancillas are |0> whenever a gate starts and every gate leaves
+    them |0>; dirty ancillas may be in any state (e.g. idle qubits of other
+    registers) and every gate restores that state. Dirty ancillas only
+    serve X gates.
+
+    Parameters
+    ----------
+    qubits : list of Qubit
+        The ancillas, all part of the circuit the gates are appended to.
+    dirty : bool (default: False)
+        Whether the ancillas are dirty.
+    '''
+
+    def __init__(self, qubits, dirty=False):
+        self.qubits = list(qubits)
+        self.dirty = dirty
+
+    def __len__(self):
+        return len(self.qubits)
+
+    def borrow(self, amount, exclude=()):
+        '''
+        Returns amount ancillas that are not in exclude, or None if there
+        are not that many.
+        '''
+        exclude = set(exclude)
+        qubits = [qubit for qubit in self.qubits if qubit not in exclude][:amount]
+        return qubits if len(qubits) == amount else None
+
+
+def set_ancilla_pool(pool):
+    '''
+    Sets the AncillaPool the multi-controlled gates built from now on borrow
+    from (None to use none).
+
+    Returns
+    -------
+    pool : AncillaPool
+        The previous pool, to restore it with set_ancilla_pool(pool).
+
+    '''
+    global _ANCILLAS
+    previous = _ANCILLAS
+    _ANCILLAS = pool
+    return previous
+
+
+def append_mcx(circuit, controls, target, ancillas=None):
+    '''
+    Appends an X on target controlled by all controls, as a V-chain over
+    ancillas from the pool when that takes fewer CX gates.
+
+    Parameters
+    ----------
+    circuit : QuantumCircuit
+        Circuit to append to.
+    controls : list of Qubit
+        Control qubits.
+    target : Qubit
+        Target qubit.
+    ancillas : AncillaPool, optional
+        Pool to borrow from. The default is the pool set by set_ancilla_pool.
+
+    Returns
+    -------
+    circuit : QuantumCircuit
+        Circuit appended with the gate.
+
+    '''
+    pool = _ANCILLAS if ancillas is None else ancillas
+    controls = list(controls)
+    
+    # A V-chain needs len(controls)-2 ancillas and only pays off from 3 (clean) or 4 (dirty) controls
+    borrowed = None
+    if pool is not None and len(controls) >= (4 if pool.dirty else 3):
+        borrowed = pool.borrow(len(controls) - 2, exclude=[*controls, target])
+    
+    if borrowed is None:
+        circuit.mcx(controls, target)
+    else:
+        circuit.mcx(controls, target, borrowed, mode='v-chain-dirty' if pool.dirty else 'v-chain')
+    return circuit
+
+
+def append_mcphase(circuit, angle, controls, target, ancillas=None):
+    '''
+    Appends P(angle) on target controlled by all controls. With enough clean
+    ancillas the AND of all but the last control is computed into an ancilla
+    (by a V-chain), which then controls a doubly controlled phase.
+
+    Parameters
+    ----------
+    circuit : QuantumCircuit
+        Circuit to append to.
+    angle : float
+        Phase angle.
+    controls : list of Qubit
+        Control qubits.
+    target : Qubit
+        Target qubit.
+    ancillas : AncillaPool, optional
+        Pool to borrow from. The default is the pool set by set_ancilla_pool.
+
+    Returns
+    -------
+    circuit : QuantumCircuit
+        Circuit appended with the gate.
+
+    '''
+    pool = _ANCILLAS if ancillas is None else ancillas
+    controls = list(controls)
+    
+    # Pays off from 4 controls, needs len(controls)-2 clean ancillas
+    borrowed = None
+    if pool is not None and not pool.dirty and len(controls) >= 4:
+        borrowed = pool.borrow(len(controls) - 2, exclude=[*controls, target])
+    
+    if borrowed is None:
+        circuit.append(mcphase(angle, len(controls)), [*controls, target])
+        return circuit
+    
+    (conjunction, chain) = (borrowed[0], borrowed[1:])
+    circuit.mcx(controls[:-1], conjunction, chain, mode='v-chain')
+    circuit.append(mcphase(angle, 2), [conjunction, controls[-1], target])
+    circuit.mcx(controls[:-1], conjunction, chain, mode='v-chain')
+    return circuit
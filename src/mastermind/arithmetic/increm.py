@@ -5,8 +5,8 @@ Created on Wed Dec  2 18:25:35 2020
 """
 from math import pi
 from qiskit import *
-from qiskit.circuit.library.standard_gates import PhaseGate
-from mastermind.arithmetic.qft import qft, iqft
+from mastermind.arithmetic.gates import append_mcphase
+from mastermind.arithmetic.qft import qft, iqft, fourier_order
 
 
 def increment(circuit, q, do_qft=True, amount=1):
@@ -37,8 +37,8 @@ def increment(circuit, q, do_qft=True, amount=1):
     if do_qft:
         qft(circuit, q)
     
-    # Actual increm core gates
-    for (i,qubit) in enumerate(q):
+    # Actual increm core gates (on q in Fourier basis order)
+    for (i,qubit) in enumerate(fourier_order(q)):
         circuit.rz(amount*pi/2**(n-1-i), qubit)  
     
     # Optional iQFT
@@ -73,7 +73,6 @@ def cnincrement(circuit, c, q, do_qft=True, amount=1):
     
     # Constants
     n = len(q)
-    nc = len(c)
     
     # Optional QFT
     if do_qft:
@@ -81,14 +80,13 @@ def cnincrement(circuit, c, q, do_qft=True, amount=1):
         qft(circuit, q)
         circuit.barrier()
     
-    # Actual core (controlled) increm gates
-    for (i,qubit) in enumerate(q):
+    # Actual core (controlled) increm gates (on q in Fourier basis order)
+    for (i,qubit) in enumerate(fourier_order(q)):
         # qcs = QuantumCircuit(1)
         # qcs.rz(amount*pi/2**(n-i-1),0)
         # ncrz = qcs.to_gate().control(nc)
         # circuit.append(ncrz, [*c, qubit])
-        ncp = PhaseGate(amount*pi/2**(n-i-1)).control(nc)
-        circuit.append(ncp, [*c, qubit])
+        append_mcphase(circuit, amount*pi/2**(n-i-1), c, qubit)
         
     
     # Optional iQFT
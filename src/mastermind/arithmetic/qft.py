@@ -4,11 +4,53 @@ Created on Wed Dec 16 14:58:05 2020
 
 @author: Gielc
 """
+from functools import lru_cache
 from numpy import pi
 from qiskit import QuantumCircuit, execute, Aer
 
-def qft_rotations(circuit, q):
-    n = len(q)
+
+# Options of every QFT built by the arithmetic, see set_qft_options
+_OPTIONS = {'min_angle': 0.0, 'swaps': True}
+
+
+def set_qft_options(min_angle=None, swaps=None):
+    '''
+    Sets the options of all QFTs (and inverse QFTs) built from now on.
+
+    Parameters
+    ----------
+    min_angle : float, optional
+        Controlled phase rotations with an angle below min_angle are left
+        out (approximate QFT). The default of 0 builds the exact QFT.
+    swaps : bool, optional
+        Whether to end the QFT with the swaps reversing the register. Without
+        them the Fourier basis register is stored in reverse order, which the
+        arithmetic takes into account via fourier_order().
+
+    Returns
+    -------
+    options : dict
+        The previous options, to restore them with set_qft_options(**options).
+
+    '''
+    previous = dict(_OPTIONS)
+    if min_angle is not None:
+        _OPTIONS['min_angle'] = float(min_angle)
+    if swaps is not None:
+        _OPTIONS['swaps'] = bool(swaps)
+    return previous
+
+
+def fourier_order(q):
+    '''
+    Returns the qubits of register q in the order the Fourier basis
+    arithmetic addresses them: as is after a QFT with swaps, reversed after
+    a swap-free QFT.
+    '''
+    return list(q) if _OPTIONS['swaps'] else list(q)[::-1]
+
+
+def qft_rotations(circuit, q, min_angle=None):
     '''
     Performs qft on the first n qubits from qubit register q in circuit
     (without swaps)
@@ -19,8 +61,9 @@ def qft_rotations(circuit, q):
         Quantum Circuit to perform QFT upon.
     q : QuantumRegister
         Register to perform QFT upon.
-    n : Integer, optional
-        Perform QFT upon first n qubits of q. The default is len(q).
+    min_angle : float, optional
+        Leave out rotations with an angle below min_angle. The default is
+        the min_angle set by set_qft_options.
 
     Returns
     -------
@@ -28,24 +71,15 @@ def qft_rotations(circuit, q):
         Quantum Circuit appended with QFT rotations.
 
     '''
+    min_angle = _OPTIONS['min_angle'] if min_angle is None else min_angle
     
-    # No qubits = no QFT
-    if n == 0:
-        return circuit
-    
-    # Decrement n to accomodate starting index at 0
-    n -= 1
-    
-    # Apply R_1 = H to the qubit
-    circuit.h(q[n])
-    
-    # For the remaining qubits apply the gates R_i controlled by qubit i.
-    for (i,qubit) in enumerate(q[0:n]):
-        circuit.cp(pi/2**(n-i), qubit, q[n])
-        
-    # At the end of our function, we call the same function again on
-    # the next qubits (we reduced n by one earlier in the function)
-    qft_rotations(circuit, q[0:n])
+    # From the last qubit down: apply R_1 = H to the qubit, then the
+    # remaining rotations R_i controlled by the qubits before it
+    for n in reversed(range(len(q))):
+        circuit.h(q[n])
+        for (i,qubit) in enumerate(q[0:n]):
+            if pi/2**(n-i) >= min_angle:
+                circuit.cp(pi/2**(n-i), qubit, q[n])
     
     return circuit
 
@@ -78,7 +112,7 @@ def swap_registers(circuit, q):
     return circuit
 
 
-def qft(circuit, q):
+def qft(circuit, q, min_angle=None):
     '''
     QFT on the first n qubits from q in circuit
     Simply combines qft_rotations() and swap_registers()
@@ -89,8 +123,10 @@ def qft(circuit, q):
         Quantum Circuit to perform QFT upon.
     q : QuantumRegister
         Register to perform QFT upon.
-    n : Integer, optional
-        Perform QFT upon first n qubits of q. The default is len(q).
+    min_angle : float, optional
+        See set_qft_options. The default is the option set there. Whether to
+        swap is always the option set there, since fourier_order() has to
+        match it.
 
     Returns
     -------
@@ -99,13 +135,27 @@ def qft(circuit, q):
     
     '''
     
-    qft_rotations(circuit, q)
-    swap_registers(circuit, q)
+    qft_rotations(circuit, q, min_angle)
+    if _OPTIONS['swaps']:
+        swap_registers(circuit, q)
     
     return circuit
 
 
-def iqft(circuit, q):
+@lru_cache(maxsize=64)
+def iqft_gate(n, min_angle=0.0, swaps=True):
+    '''
+    Returns the inverse QFT on n qubits as a gate, built once per
+    (n, min_angle, swaps) and shared by all circuits.
+    '''
+    qft_circ = QuantumCircuit(n, name='qft')
+    qft_rotations(qft_circ, qft_circ.qubits, min_angle)
+    if swaps:
+        swap_registers(qft_circ, qft_circ.qubits)
+    return qft_circ.to_gate().inverse()
+
+
+def iqft(circuit, q, min_angle=None):
     '''
     Does the inverse QFT on the first n qubits from q in circuit
     
@@ -115,8 +165,9 @@ def iqft(circuit, q):
         Quantum Circuit to perform inverse QFT upon.
     q : QuantumRegister
         Register to perform inverse QFT upon.
-    n : Integer, optional
-        Perform inverse QFT upon first n qubits of q. The default is len(q).
+    min_angle : float, optional
+        See set_qft_options. The default is the option set there. Whether to
+        swap is always the option set there, see qft.
 
     Returns
     -------
@@ -126,16 +177,12 @@ def iqft(circuit, q):
     '''
     
     n = len(q)
+    min_angle = _OPTIONS['min_angle'] if min_angle is None else min_angle
+    swaps = _OPTIONS['swaps']
     
-    # First we create a QFT circuit of the correct size:
-    qft_circ = QuantumCircuit(n)
-    qft_circ = qft(qft_circ, qft_circ.qubits)
-    
-    # Then we take the inverse of this circuit
-    invqft_circ = qft_circ.inverse()
+    # Add the (cached) inverse QFT gate of the correct size to the first n qubits.
+    # It is left as a single instruction: call .decompose() once on the
+    # finished circuit to see the individual gates.
+    circuit.append(iqft_gate(n, min_angle, swaps), q[0:n])
     
-    # And add it to the first n qubits in our existing circuit
-    circuit.append(invqft_circ, q[0:n])
-    
-    # .decompose() allows us to see the individual gates
-    return circuit.decompose()
\ No newline at end of file
+    return circuit
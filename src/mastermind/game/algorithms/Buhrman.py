@@ -4,19 +4,267 @@ Created on Mon Jan  4 17:38:52 2021
 
 @author: timvr
 """
+import os
+import threading
 import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from itertools import compress
 from qiskit import QuantumRegister, ClassicalRegister, QuantumCircuit
+from qiskit.circuit import ParameterVector
 from abc import ABC
+from experiment.profiling import phase, profiled
+from mastermind.arithmetic.gates import AncillaPool, set_ancilla_pool
 from mastermind.game.algorithms.Find_Colours import build_find_colours_circuit
 from mastermind.game.algorithms.Find_Colour_Positions import build_find_colour_positions_circuit, build_find_colour_positions_alt_circuit
+from mastermind.game.algorithms.Mastermind_Oracle import SecretParameters
 from mastermind.game.game import Game
 
+# Maximum number of circuit families kept, see circuit_family. The default
+# keeps all families of the sizes played (see families_per_size)
+FAMILY_CACHE_SIZE = int(os.getenv('MASTERMIND_FAMILY_CACHE_SIZE')) if os.getenv('MASTERMIND_FAMILY_CACHE_SIZE') else None
+
+# Circuit families already built in this process, by key (see circuit_family)
+_FAMILIES = OrderedDict()
+_FAMILIES_LOCK = threading.Lock()
+
+
+def build_colours_circuit(num_slots, num_colours, secret_sequence, ancillas=0):
+    '''
+    Builds the measured find_colours circuit for MM(num_slots, num_colours),
+    with ancillas clean ancillas for its multi-controlled gates.
+
+    Returns
+    -------
+    circuit : QuantumCircuit
+
+    '''
+    logn = int(np.ceil(np.log2(num_slots)))
+    logk = int(np.ceil(np.log2(num_colours)))
+    # Quantum Registers
+    b0 = QuantumRegister(logk+1,'b0')
+    x = QuantumRegister(num_colours, 'x')
+    q = QuantumRegister(num_slots*logk, 'q')
+    b = QuantumRegister(logk+1,'b')
+    c = QuantumRegister(logn+1,'c')
+    d = QuantumRegister(1,'d')
+    e = QuantumRegister(1,'e')
+    f = QuantumRegister(1,'f')
+    # Classical register
+    classical_x = ClassicalRegister(num_colours,'cx')
+    
+    # Circuit
+    circuit = QuantumCircuit(b0,x,q,b,c,d,e,f,classical_x)
+    pool = None
+    if ancillas > 0:
+        anc = QuantumRegister(ancillas,'anc')
+        circuit.add_register(anc)
+        pool = AncillaPool(anc)
+    
+    previous = set_ancilla_pool(pool)
+    try:
+        build_find_colours_circuit(circuit, b0, x, q, b, c, d, e, f, secret_sequence)
+    finally:
+        set_ancilla_pool(previous)
+    # Measure register x
+    circuit.measure(x, classical_x)
+    return circuit
+
+
+def build_colour_positions_circuit(num_slots, num_colours, c, d, secret_sequence, d_positions=None):
+    '''
+    Builds the measured find_colour_positions circuit of colour c (against
+    colour d) for MM(num_slots, num_colours).
+
+    Returns
+    -------
+    circuit : QuantumCircuit
+
+    '''
+    logk = int(np.ceil(np.log2(num_colours)))
+    # Quantum Registers
+    x = QuantumRegister(num_colours, 'x')
+    q = QuantumRegister(num_slots*logk, 'q')
+    a = QuantumRegister(logk+1,'a')
+    # Classical register
+    classical_x = ClassicalRegister(num_colours,'cx')
+    
+    # Circuit
+    circuit = QuantumCircuit(x,q,a,classical_x)
+    build_find_colour_positions_circuit(circuit, x, q, a, c, d, secret_sequence, d_positions)
+    # Measure register x
+    circuit.measure(x, classical_x)
+    return circuit
+
+
+def build_colour_positions_alt_circuit(num_slots, num_colours, c, secret_sequence):
+    '''
+    Builds the measured find_colour_positions_alt circuit of colour c for
+    MM(num_slots, num_colours).
+
+    Returns
+    -------
+    circuit : QuantumCircuit
+
+    '''
+    logn = int(np.ceil(np.log2(num_slots)))
+    logk = int(np.ceil(np.log2(num_colours)))
+    # Quantum Registers
+    x = QuantumRegister(num_colours, 'x')
+    q = QuantumRegister(num_slots*logk, 'q')
+    a = QuantumRegister(logk+1,'a')
+    b = QuantumRegister(logn+logk+1,'b')
+    # Classical register
+    classical_x = ClassicalRegister(num_colours,'cx')
+    
+    # Circuit
+    circuit = QuantumCircuit(x,q,a,b,classical_x)
+    build_find_colour_positions_alt_circuit(circuit, x, q, a, b, c, num_colours, secret_sequence)
+    # Measure register x
+    circuit.measure(x, classical_x)
+    return circuit
+
+
+class CircuitFamily():
+    '''
+    A Buhrman circuit for all secrets of MM(n,k) at once: the secret (and the
+    known positions of the reference colour) are parameters of the circuit,
+    bound per secret (see binds). Since the circuit object stays the same,
+    QiskitExperiment also transpiles it only once.
+
+    Parameters
+    ----------
+    circuit : QuantumCircuit
+        The parameterised circuit.
+    secret : SecretParameters
+        Parameters of the secret.
+    positions : ParameterVector, optional
+        Parameters of the known positions of the reference colour.
+    '''
+
+    def __init__(self, circuit, secret, positions=None):
+        self.circuit = circuit
+        self.secret = secret
+        self.positions = positions
+        # Not every circuit uses every parameter of the secret (e.g. the colour counts)
+        self.parameters = set(circuit.parameters)
+
+    def binds(self, secret_sequence, d_positions=None):
+        '''
+        Returns the parameter values of secret_sequence (and d_positions).
+        '''
+        binds = self.secret.binds(secret_sequence)
+        if self.positions is not None:
+            binds.update(zip(self.positions, d_positions))
+        return {parameter: value for (parameter, value) in binds.items() if parameter in self.parameters}
+
+
+def build_circuit_family(name, num_slots, num_colours, c=None, d=None, with_positions=False, ancillas=0):
+    '''
+    Builds a CircuitFamily.
+
+    Parameters
+    ----------
+    name : Str
+        find_colours, find_colour_positions or find_colour_positions_alt.
+    num_slots : Int
+        Length of the secret.
+    num_colours : Int
+        Number of colours.
+    c : Int, optional
+        Colour to find the positions of.
+    d : Int, optional
+        Reference colour of find_colour_positions.
+    with_positions : Bool
+        Whether the positions of d are known (find_colour_positions).
+    ancillas : Int
+        Clean ancillas of find_colours.
+
+    Returns
+    -------
+    family : CircuitFamily
+
+    '''
+    secret = SecretParameters(num_slots, num_colours)
+    positions = None
+    if name == 'find_colours':
+        circuit = build_colours_circuit(num_slots, num_colours, secret, ancillas)
+    elif name == 'find_colour_positions':
+        if with_positions:
+            # One per qubit of reg x
+            positions = ParameterVector('d_positions', min(num_slots, num_colours))
+        circuit = build_colour_positions_circuit(num_slots, num_colours, c, d, secret, positions)
+    elif name == 'find_colour_positions_alt':
+        circuit = build_colour_positions_alt_circuit(num_slots, num_colours, c, secret)
+    else:
+        raise ValueError("Unknown circuit %s" % name)
+    return CircuitFamily(circuit, secret, positions)
+
+
+def families_per_size(num_colours):
+    '''
+    Returns the number of circuit families of MM(n, num_colours): one
+    find_colours family, one find_colour_positions_alt family per colour and
+    two find_colour_positions families (with and without known positions)
+    per pair of colours.
+    '''
+    return 1 + num_colours + 2*num_colours*(num_colours - 1)
+
+
+def _cache_family(key, family):
+    # Without a set size, keep at least every family of the size of key
+    size = families_per_size(key[2]) if FAMILY_CACHE_SIZE is None else FAMILY_CACHE_SIZE
+    with _FAMILIES_LOCK:
+        _FAMILIES[key] = family
+        _FAMILIES.move_to_end(key)
+        while len(_FAMILIES) > size:
+            _FAMILIES.popitem(last=False)
+
+
+def cached_family(key):
+    '''
+    Returns the CircuitFamily of key (the arguments of build_circuit_family)
+    if it was built already, otherwise None.
+    '''
+    with _FAMILIES_LOCK:
+        family = _FAMILIES.get(key)
+        if family is not None:
+            _FAMILIES.move_to_end(key)
+        return family
+
+
+def circuit_family(*key):
+    '''
+    Returns the CircuitFamily of key (the arguments of build_circuit_family),
+    built once per process.
+    '''
+    family = cached_family(key)
+    if family is None:
+        family = build_circuit_family(*key)
+        _cache_family(key, family)
+    return family
+
+
+def clear_circuit_families():
+    '''
+    Forgets every circuit family built so far.
+    '''
+    with _FAMILIES_LOCK:
+        _FAMILIES.clear()
+
+
 class Buhrman(Game, ABC):
-    def __init__(self, num_slots=4, num_colours=4):
+    def __init__(self, num_slots=4, num_colours=4, ancillas=0, experiment=None, workers=1):
+        
+        # Clean ancillas for the multi-controlled gates of find_colours (see arithmetic.gates)
+        self.ancillas = ancillas
         
-        # Initialise Quantum Game
-        super(Buhrman, self).__init__(10, num_slots, num_colours, False)
+        # Processes building the colour position circuits (default: 1, in this process;
+        # None: all cores). A pool only pays off for circuits that take long to build
+        self.workers = os.cpu_count() if workers is None else workers
+        
+        # Initialise Quantum Game (on the given experiment, if any)
+        super(Buhrman, self).__init__(10, num_slots, num_colours, False, experiment=experiment)
         
         # constants
         self.num_slots = num_slots
@@ -41,21 +289,18 @@ class Buhrman(Game, ABC):
         if not self.all_colours_used:
             # If not all colours are used: simple continued algorithm
             d = self.used_colours.index(0)  # smallest unused colour
-            for (c, colour_used) in enumerate(self.used_colours):
-                if colour_used:
-                    pos = self.find_colour_positions(c, d)
-                    print("     %d: %s" % (c, str(pos)))
-                    # change the guess according to the output
-                    self.secret_string_guess = [c if j==1 else self.secret_string_guess[i] for (i,j) in enumerate(pos)]
+            colours = list(compress(list(range(self.k)),self.used_colours))
+            # The colours are independent given d: find all their positions in one batch
+            for (c, pos) in zip(colours, self.find_all_colour_positions(colours, d)):
+                print("     %d: %s" % (c, str(pos)))
+                # change the guess according to the output
+                self.secret_string_guess = [c if j==1 else self.secret_string_guess[i] for (i,j) in enumerate(pos)]
         else:
             # otherwise: more complex continued alg
-            pos0 = []
-            for c in range(self.k):
-                if c == 0:
-                    pos = self.find_colour_positions_alt(c)
-                    pos0 = pos
-                else:
-                    pos = self.find_colour_positions(c, 0, pos0)
+            pos0 = self.find_colour_positions_alt(0)
+            colours = list(range(1, self.k))
+            # Given the positions of colour 0, the other colours are independent
+            for (c, pos) in zip([0] + colours, [pos0] + self.find_all_colour_positions(colours, 0, pos0)):
                 print("     Colour %d: %s" % (c, str(pos)))
                 # change the guess according to the output
                 self.secret_string_guess = [c if j==1 else self.secret_string_guess[i] for (i,j) in enumerate(pos)]
@@ -69,90 +314,80 @@ class Buhrman(Game, ABC):
                     
             
         
+    @profiled('find_colours')
     def find_colours(self):
         
-        # Quantum Registers
-        self.b0 = QuantumRegister(self.logk+1,'b0')
-        self.x = QuantumRegister(self.k, 'x')
-        self.q = QuantumRegister(self.n*self.logk, 'q')
-        self.b = QuantumRegister(self.logk+1,'b')
-        self.c = QuantumRegister(self.logn+1,'c')
-        self.d = QuantumRegister(1,'d')
-        self.e = QuantumRegister(1,'e')
-        self.f = QuantumRegister(1,'f')
-        # Classical register
-        self.classical_x = ClassicalRegister(self.num_colours,'cx')
-        
-        # Circuit
-        self.circuit = QuantumCircuit(self.b0,self.x,self.q,self.b,self.c,self.d,self.e,self.f,self.classical_x)
-        
-        # If there is no check circuit:
-        if self.circuit.size() == 0:
-            # Build check circuit
-            build_find_colours_circuit(self.circuit, self.b0, self.x, self.q, self.b, self.c, self.d, self.e, self.f, self.sequence)
-            # Measure register x
-            self.circuit.measure(self.x, self.classical_x)
-            
-        # Run the circuit
-        result = self.experiment.run(self.circuit, 1)
-        counts = result.get_counts(self.circuit)
-        res_x_string = list(counts.keys())[0]
-        res_x = [int(bit) for bit in res_x_string]
-        res_x.reverse()
-        return res_x
+        # Check circuit for every secret of this size
+        with phase('build'):
+            family = circuit_family('find_colours', self.n, self.k, None, None, False, self.ancillas)
+        return self._run_family(family)
     
     
+    @profiled('find_colour_positions')
     def find_colour_positions(self, c, d, d_positions=None):
         
-        # Quantum Registers
-        self.x = QuantumRegister(self.k, 'x')
-        self.q = QuantumRegister(self.n*self.logk, 'q')
-        self.a = QuantumRegister(self.logk+1,'a')
-        # Classical register
-        self.classical_x = ClassicalRegister(self.num_colours,'cx')
-        
-        # Circuit
-        self.circuit = QuantumCircuit(self.x,self.q,self.a,self.classical_x)
-        
-        # If there is no check circuit:
-        if self.circuit.size() == 0:
-            # Build check circuit
-            build_find_colour_positions_circuit(self.circuit, self.x, self.q, self.a, c, d, self.sequence, d_positions)
-            # Measure register x
-            self.circuit.measure(self.x, self.classical_x)
-            
-        # Run the circuit
-        result = self.experiment.run(self.circuit, 1)
-        counts = result.get_counts(self.circuit)
-        res_x_string = list(counts.keys())[0]
-        res_x = [int(bit) for bit in res_x_string]
-        res_x.reverse()
-        return res_x
+        # Check circuit for every secret of this size
+        with phase('build'):
+            family = circuit_family('find_colour_positions', self.n, self.k, c, d, d_positions is not None)
+        return self._run_family(family, d_positions)
+    
+    
+    @profiled('find_all_colour_positions')
+    def find_all_colour_positions(self, colours, d, d_positions=None):
+        '''
+        Finds the positions of many colours (against the same colour d): builds
+        the circuits that are not cached yet in self.workers processes and
+        runs them all as one batch.
+
+        Returns
+        -------
+        positions : list of Int list
+            Positions of every colour, in the order of colours.
+
+        '''
+        if len(colours) == 0:
+            return []
+        
+        # Check circuits for every secret of this size
+        keys = [('find_colour_positions', self.n, self.k, c, d, d_positions is not None) for c in colours]
+        missing = [key for key in keys if cached_family(key) is None]
+        with phase('build', circuits=len(missing)):
+            if self.workers > 1 and len(missing) > 1:
+                with ProcessPoolExecutor(min(self.workers, len(missing))) as executor:
+                    families = list(executor.map(build_circuit_family, *zip(*missing)))
+            else:
+                families = [build_circuit_family(*key) for key in missing]
+            for (key, family) in zip(missing, families):
+                _cache_family(key, family)
+            families = [circuit_family(*key) for key in keys]
+        self.circuit = families[-1].circuit
+        
+        # Run the circuits as one job
+        counts = self.experiment.run_batch([family.circuit for family in families], 1,
+                                           parameter_binds=[family.binds(self.sequence, d_positions) for family in families])
+        with phase('parse'):
+            return [self._read_positions(colour_counts) for colour_counts in counts]
     
     
+    @profiled('find_colour_positions_alt')
     def find_colour_positions_alt(self, c):
         
-        # Quantum Registers
-        self.x = QuantumRegister(self.k, 'x')
-        self.q = QuantumRegister(self.n*self.logk, 'q')
-        self.a = QuantumRegister(self.logk+1,'a')
-        self.b = QuantumRegister(self.logn+self.logk+1,'b')
-        # Classical register
-        self.classical_x = ClassicalRegister(self.num_colours,'cx')
-        
-        # Circuit
-        self.circuit = QuantumCircuit(self.x,self.q,self.a,self.b,self.classical_x)
-        
-        # If there is no check circuit:
-        if self.circuit.size() == 0:
-            # Build check circuit
-            build_find_colour_positions_alt_circuit(self.circuit, self.x, self.q, self.a, self.b, c, self.k, self.sequence)
-            # Measure register x
-            self.circuit.measure(self.x, self.classical_x)
-            
-        # Run the circuit
-        result = self.experiment.run(self.circuit, 1)
-        counts = result.get_counts(self.circuit)
+        # Check circuit for every secret of this size
+        with phase('build'):
+            family = circuit_family('find_colour_positions_alt', self.n, self.k, c)
+        return self._run_family(family)
+    
+    
+    def _run_family(self, family, d_positions=None):
+        # Run the circuit, bound to the secret
+        self.circuit = family.circuit
+        result = self.experiment.run(self.circuit, 1, parameter_binds=[family.binds(self.sequence, d_positions)])
+        with phase('parse'):
+            return self._read_positions(result.get_counts(0))
+    
+    
+    @staticmethod
+    def _read_positions(counts):
         res_x_string = list(counts.keys())[0]
         res_x = [int(bit) for bit in res_x_string]
         res_x.reverse()
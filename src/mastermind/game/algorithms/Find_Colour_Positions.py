@@ -8,8 +8,10 @@ Created on Mon Jan  4 16:08:17 2021
 from mastermind.game.algorithms.Mastermind_Oracle import build_mastermind_a_circuit, build_mastermind_b_circuit
 from mastermind.arithmetic.dradder import add, sub
 from mastermind.arithmetic.count import count, icount
-from mastermind.arithmetic.increm import increment, decrement, cnincrement, cndecrement
+from mastermind.arithmetic.increm import increment, decrement, cnincrement
+from mastermind.arithmetic.qft import qft, iqft
 from qiskit import QuantumCircuit
+from qiskit.circuit import ParameterExpression
 import numpy as np
 
 def build_find_colour_positions_circuit(circuit, x, q, a, c, d, secret_sequence, d_positions=None):
@@ -32,7 +34,10 @@ def build_find_colour_positions_circuit(circuit, x, q, a, c, d, secret_sequence,
     d : integer, d in {0, 1, ..., k-1}
         any colour which does not occur in the secret string
     secret_sequence: List, length n
-        Secret sequence.
+        Secret sequence (or SecretParameters).
+    d_positions: List, length n, optional
+        1 at the known positions of colour d, if d occurs in the secret
+        string (or a ParameterVector).
 
     Returns
     -------
@@ -57,25 +62,14 @@ def build_find_colour_positions_circuit(circuit, x, q, a, c, d, secret_sequence,
     circuit.barrier()
     
     #3.alt: sub d positions if used
-    if d_positions != None:
-        for (i,j) in enumerate(d_positions):
-            if j == 1:
-                circuit.x(x[i])
-                cndecrement(circuit, [x[i]], a)
-                circuit.x(x[i])
-                circuit.barrier()
+    _known_positions(circuit, x, a, d_positions, sign=-1)
     
     #4: Z gate on output LSB
     circuit.z(a[0]) # should be the LSB; maybe that's actually a[-1]!!!!!!!!!!
     circuit.barrier()
     
     #5: undo step 2 & 3
-    if d_positions != None:
-        for (i,j) in enumerate(d_positions):
-            if j == 1:
-                circuit.x(x[i])
-                cnincrement(circuit, [x[i]], a)
-                circuit.x(x[i])
+    _known_positions(circuit, x, a, d_positions, sign=1)
     build_mastermind_a_circuit(circuit, q, a, secret_sequence, do_inverse=True)
     _build_query_two_colours(circuit, x, q, c, d)
     circuit.barrier()
@@ -185,6 +179,30 @@ def build_find_colour_positions_alt_circuit(circuit, x, q, a, b, c, k, secret_se
     return circuit
 
 
+def _known_positions(circuit, x, a, d_positions, sign):
+    '''
+    Adds sign times the number of x[i] that are 0 at the known positions of
+    colour d to reg a. A position is known if its entry of d_positions is 1
+    or a Parameter (bound to 0 or 1 later).
+    '''
+    if d_positions is None:
+        return circuit
+    positions = [(i,j) for (i,j) in enumerate(d_positions) if isinstance(j, ParameterExpression) or j == 1]
+    if len(positions) == 0:
+        return circuit
+    
+    # One QFT on reg a for all positions
+    qft(circuit, a)
+    for (i,j) in positions:
+        circuit.x(x[i])
+        cnincrement(circuit, [x[i]], a, do_qft=False, amount=sign*j)
+        circuit.x(x[i])
+    iqft(circuit, a)
+    circuit.barrier()
+    
+    return circuit
+
+
 def _build_query_two_colours(circuit, x, q, c, d):
     '''
     Performs CNOTs on the query q according to binary proto-query x:
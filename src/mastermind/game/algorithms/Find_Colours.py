@@ -12,6 +12,7 @@ from mastermind.arithmetic.increm import increment, decrement, cnincrement, cnde
 
 from mastermind.arithmetic.count import count, icount
 from mastermind.arithmetic.comp import compare
+from mastermind.arithmetic.gates import append_mcx
 
 from mastermind.game.algorithms.Mastermind_Oracle import build_mastermind_a_circuit, build_mastermind_b_circuit, build_mastermind_b_circuit_v2
 from qiskit import QuantumCircuit
@@ -179,12 +180,8 @@ def _ncx(circuit, a, b):
 
     """
     
-    na = len(a)
-    
-    temp_circuit = QuantumCircuit(1)
-    temp_circuit.x(0)
-    ncx = temp_circuit.to_gate().control(na)
-    circuit.append(ncx, [*a, b])
+    # Borrows ancillas from the pool set in mastermind.arithmetic.gates, if any
+    append_mcx(circuit, a, b)
     
     return circuit
 
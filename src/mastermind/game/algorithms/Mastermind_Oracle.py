@@ -8,13 +8,67 @@ Created on Mon Jan  4 16:07:48 2021
 import math
 import numpy as np
 from itertools import permutations, combinations
-from mastermind.arithmetic.dradder import cadd, csub
+from qiskit.circuit import ParameterExpression, ParameterVector
+from mastermind.arithmetic.dradder import add, cadd, csub
 from mastermind.arithmetic.comp import compare
 from mastermind.arithmetic.count import count, icount
 from mastermind.arithmetic.increm import increment, decrement, cnincrement, cndecrement
 from mastermind.arithmetic.qft import qft, iqft
 
 
+# Versions of the b-oracle: v1 (inclusion-exclusion over the slots), v2 (sign
+# bit per colour), fused (v2 kept in the Fourier basis) and poly (counter and
+# corrections per colour, polynomial in n)
+B_ORACLES = ('v1', 'v2', 'fused', 'poly')
+
+
+class SecretParameters():
+    '''
+    Secret string as circuit parameters, so that a circuit is built (and
+    transpiled) once for all secrets of MM(n,k) and bound per secret (see
+    binds). The a-oracle and the v2 b-oracle accept it in place of s.
+
+    Parameters
+    ----------
+    num_slots : Int
+        Length of the secret.
+    colour_amount : Int
+        Number of colours.
+    name : Str (default: 's')
+        Prefix of the parameter names.
+    '''
+
+    def __init__(self, num_slots, colour_amount, name='s'):
+        self.num_slots = num_slots
+        self.colour_amount = colour_amount
+        self.logk = int(np.ceil(np.log2(colour_amount)))
+        # X rotation of every query qubit (pi for a 0-bit, see binary_to_x_gates)
+        self.bits = ParameterVector(name + '_bits', num_slots*self.logk)
+        # How often every colour occurs
+        self.counts = ParameterVector(name + '_counts', colour_amount)
+
+    def __len__(self):
+        return self.num_slots
+
+    def colours_amount(self):
+        '''
+        Returns how often every colour occurs (0 for the values of logk bits
+        that are no colour).
+        '''
+        return list(self.counts) + [0]*(2**self.logk - self.colour_amount)
+
+    def binds(self, s):
+        '''
+        Returns the parameter values of secret string s.
+        '''
+        if any(x not in range(self.colour_amount) for x in s):
+            raise ValueError("Secret string contains illegal values")
+        binary_list = [bin(x)[2:].zfill(self.logk) for x in s]
+        bits = [np.pi*(bit == '0') for binary in binary_list for bit in binary[::-1]]
+        counts = [list(s).count(i) for i in range(self.colour_amount)]
+        return {**dict(zip(self.bits, bits)), **dict(zip(self.counts, counts))}
+
+
 def build_mastermind_a_circuit(circuit, q, a, s, do_inverse=False):
     '''
     Counts a_s(q): the number of correct positions and colours in query q (compared to s).
@@ -28,7 +82,7 @@ def build_mastermind_a_circuit(circuit, q, a, s, do_inverse=False):
     a : QuantumRegister, length ceil(log(n))+1
         Register which stores amount of correct positions and colours.
     s : Int list, length n
-        Permutation of secret string.
+        Permutation of secret string (or SecretParameters).
     do_inverse : bool (default: False)
         Whether to perform the inverse of the circuit.
 
@@ -44,10 +98,13 @@ def build_mastermind_a_circuit(circuit, q, a, s, do_inverse=False):
     logk = len(q)//n
     
     # Write s in binary representation
-    binary_list = [bin(x)[2:].zfill(logk) for x in s]
+    if isinstance(s, SecretParameters):
+        binary_list = None
+    else:
+        binary_list = [bin(x)[2:].zfill(logk) for x in s]
     
     # Apply x gates to implement permuted secret string
-    binary_to_x_gates(circuit, q, binary_list)
+    _secret_to_x_gates(circuit, q, s, binary_list)
     
     # Count the amount of correct qubits
     if not do_inverse:
@@ -56,11 +113,20 @@ def build_mastermind_a_circuit(circuit, q, a, s, do_inverse=False):
         icount(circuit, q, a, logk)
     
     # permute back
-    binary_to_x_gates(circuit, q, binary_list)
+    _secret_to_x_gates(circuit, q, s, binary_list)
     
     return circuit
 
 
+def _secret_to_x_gates(circuit, q, s, binary_list):
+    # X rotations of the parameterised secret, x gates of a given one
+    if binary_list is None:
+        for (qubit, angle) in zip(q, s.bits):
+            circuit.rx(angle, qubit)
+    else:
+        binary_to_x_gates(circuit, q, binary_list)
+
+
 def build_mastermind_b_circuit(circuit, q, b, s, do_inverse=False):
     '''
     Counts b_s(q): the number of correct colours in query q (compared to s).
@@ -143,7 +209,7 @@ def build_mastermind_b_circuit_v2(circuit, q, b, c, d, s, do_inverse=False):
     d : QuantumRegister, length 1
         Ancilla register which stores the sign sgn(n_s(q)-n_c(q)).
     s : Int list, length n
-        Secret string.
+        Secret string (or SecretParameters).
     do_inverse : bool (default: False)
         Whether to perform the inverse of the circuit.
 
@@ -159,11 +225,14 @@ def build_mastermind_b_circuit_v2(circuit, q, b, c, d, s, do_inverse=False):
     logk = len(q)//n
     
     # How often which colour occurs in the list
-    secret_sequence_colours_amount = [list(s).count(i) for i in range(2**logk)] # rather k, but that's annoying
-    
-    # Check if valid secret string
-    if sum(secret_sequence_colours_amount) != n:
-        raise ValueError("Secret string contains illegal values")
+    if isinstance(s, SecretParameters):
+        secret_sequence_colours_amount = s.colours_amount()
+    else:
+        secret_sequence_colours_amount = [list(s).count(i) for i in range(2**logk)] # rather k, but that's annoying
+        
+        # Check if valid secret string
+        if sum(secret_sequence_colours_amount) != n:
+            raise ValueError("Secret string contains illegal values")
     
     
     # Put QFT on reg b outside loop for efficiency
@@ -176,8 +245,8 @@ def build_mastermind_b_circuit_v2(circuit, q, b, c, d, s, do_inverse=False):
     circuit.x(d)
     # Loop over colours (and how often they're used)
     for (clr, nc) in enumerate(secret_sequence_colours_amount):
-        # Only start counting process is colour is used at all
-        if nc != 0:
+        # Only start counting process is colour is used at all (or may be)
+        if isinstance(nc, ParameterExpression) or nc != 0:
             
             # Write colour clr in n*binary...
             binary_list = [bin(clr)[2:].zfill(logk)]*n
@@ -223,6 +292,239 @@ def build_mastermind_b_circuit_v2(circuit, q, b, c, d, s, do_inverse=False):
     return circuit
 
 
+def build_mastermind_b_circuit_fused(circuit, q, b, c, d, s, do_inverse=False):
+    '''
+    Counts b_s(q): the number of correct colours in query q (compared to s).
+    
+    Same result as build_mastermind_b_circuit_v2, but regs c and d stay in the
+    Fourier basis across colours: per colour there is a single iQFT before the
+    controlled subtraction and a single QFT after it (instead of a QFT/iQFT
+    pair around each of the increment, icount, count and decrement). The
+    decrement of one colour is merged with the increment of the next and the
+    x gates undoing one colour pattern are merged with those of the next.
+
+    Parameters
+    ----------
+    circuit : QuantumCircuit
+        Quantum circuit to perform counting on.
+    q : QuantumRegister, length n*ceil(log(k))
+        Query register.
+    b : QuantumRegister, length ceil(log(n))+1
+        Register which stores amount of correct colours.
+    c : QuantumRegister, length ceil(log(n))+1
+        Ancilla register which stores the differences abs(n_s(q)-n_c(q)).
+    d : QuantumRegister, length 1
+        Ancilla register which stores the sign sgn(n_s(q)-n_c(q)).
+    s : Int list, length n
+        Secret string.
+    do_inverse : bool (default: False)
+        Whether to perform the inverse of the circuit.
+
+    Returns
+    -------
+    circuit : QuantumCircuit
+        Quantum circuit appended with b-oracle.
+    
+    '''
+    
+    # Extract basic system parameters (n = # of pins, k = # of colours, logk = # of bits for k)
+    n = len(s)
+    logk = len(q)//n
+    
+    # How often which colour occurs in the list
+    secret_sequence_colours_amount = [list(s).count(i) for i in range(2**logk)] # rather k, but that's annoying
+    
+    # Check if valid secret string
+    if sum(secret_sequence_colours_amount) != n:
+        raise ValueError("Secret string contains illegal values")
+    
+    # Sign of the additions on reg b (the colours commute, so only the signs change for the inverse)
+    sign = -1 if do_inverse else 1
+    
+    # Reg c with its sign bit d on top; c never overflows into d since n_c(s) < 2**len(c)
+    cd = [*c, d]
+    
+    # Put QFT on reg b outside loop for efficiency and add (or subtract) n to it
+    qft(circuit, b)
+    increment(circuit, b, amount=sign*n, do_qft=False)
+    
+    # Flip sign bit d and bring reg c (with d) to the Fourier basis once
+    circuit.x(d)
+    qft(circuit, cd)
+    
+    # No x gates (all '1') before the first colour, n_c(s) of the previous colour in reg c
+    binary_list = ['1'*logk]*n
+    previous_nc = 0
+    
+    # Loop over colours (and how often they're used)
+    for (clr, nc) in enumerate(secret_sequence_colours_amount):
+        # Only start counting process is colour is used at all
+        if nc != 0:
+            
+            # Change the x gates of the previous colour into those of colour clr (so if matches, then |11>)
+            colour_list = [bin(clr)[2:].zfill(logk)]*n
+            change_x_gates(circuit, q, binary_list, colour_list)
+            binary_list = colour_list
+            
+            # Replace n_c(s) of the previous colour by that of this one in reg c...
+            increment(circuit, cd, amount=nc-previous_nc, do_qft=False)
+            previous_nc = nc
+            
+            # ... and subtract n_c(q) from that value (with sign bit d)
+            icount(circuit, q, cd, step=logk, do_qft=False)
+            
+            # If sign bit d has not flipped (i.e. is True, i.e n_c(q)<n_c(s)):
+            #  subtract (or add) difference n_c(s)-n_c(q)
+            iqft(circuit, cd)
+            if not do_inverse:
+                csub(circuit, a=c, b=b, c=d, do_qft=False)
+            else:
+                cadd(circuit, a=c, b=b, c=d, do_qft=False)
+            qft(circuit, cd)
+            
+            # Undo the count (the decrement follows with the next colour)
+            count(circuit, q, cd, step=logk, do_qft=False)
+            circuit.barrier()
+    
+    # Undo the last colour: x gates and n_c(s) in reg c
+    change_x_gates(circuit, q, binary_list, ['1'*logk]*n)
+    decrement(circuit, cd, amount=previous_nc, do_qft=False)
+    
+    # Bring reg c back from the Fourier basis and flip sign bit d
+    iqft(circuit, cd)
+    circuit.x(d)
+    
+    # Finish sum procedure with iQFT on reg b
+    iqft(circuit, b)
+    
+    return circuit
+
+
+def build_mastermind_b_circuit_poly(circuit, q, b, c, s, do_inverse=False):
+    '''
+    Counts b_s(q): the number of correct colours in query q (compared to s).
+    
+    Adds min(n_c(s), n_c(q)) to reg b for every colour c: n_c(q) is counted
+    into reg c and added to reg b, after which every value v > n_c(s) reg c
+    can take is corrected by subtracting v-n_c(s), controlled on reg c == v.
+    Unlike build_mastermind_b_circuit this takes O(k*n*log(n)) controlled
+    increments instead of a number exponential in n.
+
+    Parameters
+    ----------
+    circuit : QuantumCircuit
+        Quantum circuit to perform counting on.
+    q : QuantumRegister, length n*ceil(log(k))
+        Query register.
+    b : QuantumRegister, length ceil(log(n))+1
+        Register which stores amount of correct colours.
+    c : QuantumRegister, length ceil(log(n))+1
+        Ancilla register which stores the count n_c(q).
+    s : Int list, length n
+        Secret string.
+    do_inverse : bool (default: False)
+        Whether to perform the inverse of the circuit.
+
+    Returns
+    -------
+    circuit : QuantumCircuit
+        Quantum circuit appended with b-oracle.
+    
+    '''
+    
+    # Extract basic system parameters (n = # of pins, k = # of colours, logk = # of bits for k)
+    n = len(s)
+    logk = len(q)//n
+    nc_bits = len(c)
+    
+    # How often which colour occurs in the list
+    secret_sequence_colours_amount = [list(s).count(i) for i in range(2**logk)] # rather k, but that's annoying
+    
+    # Check if valid secret string
+    if sum(secret_sequence_colours_amount) != n:
+        raise ValueError("Secret string contains illegal values")
+    
+    # Sign of the additions on reg b (the colours commute, so only the signs change for the inverse)
+    sign = -1 if do_inverse else 1
+    
+    # Put QFT on regs b and c outside loop for efficiency
+    qft(circuit, b)
+    qft(circuit, c)
+    
+    # No x gates (all '1') before the first colour
+    binary_list = ['1'*logk]*n
+    
+    # Loop over colours (and how often they're used)
+    for (clr, nc) in enumerate(secret_sequence_colours_amount):
+        # Only start counting process is colour is used at all
+        if nc != 0:
+            
+            # Change the x gates of the previous colour into those of colour clr (so if matches, then |11>)
+            colour_list = [bin(clr)[2:].zfill(logk)]*n
+            change_x_gates(circuit, q, binary_list, colour_list)
+            binary_list = colour_list
+            
+            # Count n_c(q) in reg c and add it to reg b
+            count(circuit, q, c, step=logk, do_qft=False)
+            iqft(circuit, c)
+            add(circuit, c, b, do_qft=False, amount=sign)
+            
+            # Where n_c(q) = v > n_c(s): subtract the excess v-n_c(s) again
+            for v in range(nc+1, n+1):
+                value_list = [bin(v)[2:].zfill(nc_bits)]
+                binary_to_x_gates(circuit, c, value_list)
+                cndecrement(circuit, list(c), b, amount=sign*(v-nc), do_qft=False)
+                binary_to_x_gates(circuit, c, value_list)
+            
+            # Uncount reg c
+            qft(circuit, c)
+            icount(circuit, q, c, step=logk, do_qft=False)
+            circuit.barrier()
+    
+    # Undo the x gates of the last colour
+    change_x_gates(circuit, q, binary_list, ['1'*logk]*n)
+    
+    # Finish sum procedure with iQFT on regs c and b
+    iqft(circuit, c)
+    iqft(circuit, b)
+    
+    return circuit
+
+
+def change_x_gates(circuit, q, s_bin_from, s_bin_to):
+    '''
+    Changes the x gates placed by binary_to_x_gates for s_bin_from into those
+    for s_bin_to, i.e. places an x gate wherever the two differ.
+
+    Parameters
+    ----------
+    circuit : QuantumCircuit
+        Circuit to add x gates to.
+    q : QuantumRegister, length n*ceil(log(k))
+        Register to add x gates to.
+    s_bin_from : str list, length n (and strings of length ceil(log(k)))
+        list containing the binary strings currently applied.
+    s_bin_to : str list, length n (and strings of length ceil(log(k)))
+        list containing the binary strings to apply instead.
+
+    Returns
+    -------
+    circuit : QuantumCircuit
+        Circuit appended with x gates.
+    
+    '''
+    
+    # Amount of colour bits
+    logk = len(s_bin_to[0])
+    
+    for (i,(binary_from,binary_to)) in enumerate(zip(s_bin_from, s_bin_to)):
+        for (j,(bit_from,bit_to)) in enumerate(zip(binary_from[::-1], binary_to[::-1])):
+            if bit_from != bit_to:
+                circuit.x(q[i*logk + j])
+    
+    return circuit
+
+
 def binary_to_x_gates(circuit, q, s_bin):
     '''
     Places an x gate for each 0 of an element of s_bin
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Feedback-table engine for the classical Mastermind solvers.
+
+Every (guess, secret) pair of MM(n,k) is scored once and stored as a compact
+integer code, black*(n+1) + white, so that solvers can reduce over whole
+partitions with NumPy instead of calling _check_input in nested loops.
+Scoring itself goes through the batch scorer check_inputs in classicalgame.
+"""
+from functools import lru_cache
+
+import numpy as np
+
+from mastermind.game.classicalgame import iter_check_inputs
+
+# Full (codes x codes) matrices above this many entries are not precomputed;
+# the required columns are then scored on demand (e.g. MM(6,6) and larger).
+MAX_MATRIX_ENTRIES = 2**27
+
+# Upper bound on the amount of temporary entries used while counting partitions.
+_BLOCK_ENTRIES = 2**22
+
+
+def generate_codes(num_slots, pin_amount):
+    '''
+    Generates all possible codes of MM(num_slots, pin_amount), in the same
+    order as itertools.product(range(pin_amount), repeat=num_slots).
+
+    Parameters
+    ----------
+    num_slots : Int
+        Length of a code.
+    pin_amount : Int
+        Number of colours.
+
+    Returns
+    -------
+    codes : np.ndarray, shape (pin_amount**num_slots, num_slots)
+        Table of all codes.
+
+    '''
+    index = np.arange(pin_amount**num_slots)
+    powers = pin_amount**np.arange(num_slots - 1, -1, -1)
+    return ((index[:, None] // powers[None, :]) % pin_amount).astype(np.int8)
+
+
+def encode_feedback(correct, semi_correct, num_slots):
+    '''
+    Encodes a (blacks, whites) answer as a single integer.
+    '''
+    return correct*(num_slots + 1) + semi_correct
+
+
+def decode_feedback(feedback, num_slots):
+    '''
+    Decodes an integer answer back into (blacks, whites).
+    '''
+    return divmod(int(feedback), num_slots + 1)
+
+
+def score_codes(codes, secrets, pin_amount):
+    '''
+    Scores every code against every secret.
+
+    Parameters
+    ----------
+    codes : np.ndarray, shape (N, num_slots)
+        Codes to score.
+    secrets : np.ndarray, shape (M, num_slots)
+        Secrets to score the codes against.
+    pin_amount : Int
+        Number of colours.
+
+    Returns
+    -------
+    feedback : np.ndarray, shape (N, M), dtype uint8
+        Encoded feedback (see encode_feedback) for every pair.
+
+    '''
+    num_slots = np.shape(codes)[1]
+    feedback = np.empty((len(codes), len(secrets)), dtype=np.uint8)
+    for (start, correct, semi_correct) in iter_check_inputs(codes, secrets, pin_amount):
+        feedback[start:start + len(correct)] = encode_feedback(correct, semi_correct, num_slots)
+    return feedback
+
+
+class FeedbackTable():
+    '''
+    All codes of MM(n,k) together with their (lazily computed) feedback matrix.
+    '''
+
+    def __init__(self, num_slots, pin_amount, max_entries=MAX_MATRIX_ENTRIES):
+        self.num_slots = num_slots
+        self.pin_amount = pin_amount
+        self.codes = generate_codes(num_slots, pin_amount)
+        self.num_codes = len(self.codes)
+        self.num_feedbacks = (num_slots + 1)**2
+        self._powers = pin_amount**np.arange(num_slots - 1, -1, -1)
+
+        # Precompute the whole matrix when it is small enough
+        if self.num_codes**2 <= max_entries:
+            self._matrix = score_codes(self.codes, self.codes, pin_amount)
+        else:
+            self._matrix = None
+
+    def index(self, code):
+        '''
+        Returns the row of code in the code table.
+        '''
+        return int(np.dot(np.asarray(code, dtype=np.int64), self._powers))
+
+    def code(self, index):
+        '''
+        Returns the code at row index as a tuple of ints.
+        '''
+        return tuple(int(pin) for pin in self.codes[index])
+
+    def feedback(self, guess_indices, secret_indices):
+        '''
+        Returns the encoded feedback matrix of the given guesses (rows)
+        against the given secrets (columns).
+        '''
+        if self._matrix is not None:
+            return self._matrix[np.ix_(guess_indices, secret_indices)]
+        return score_codes(self.codes[guess_indices], self.codes[secret_indices], self.pin_amount)
+
+    def feedback_row(self, guess):
+        '''
+        Returns the encoded feedback of one guess against all codes (a view
+        into the matrix when it is precomputed).
+        '''
+        if self._matrix is not None:
+            return self._matrix[guess]
+        return score_codes(self.codes[[guess]], self.codes, self.pin_amount)[0]
+
+    def partition_sizes(self, guess_indices, secret_indices):
+        '''
+        Counts, for every guess, how the secrets are partitioned over the
+        possible answers.
+
+        Parameters
+        ----------
+        guess_indices : array of Int
+            Rows of the guesses to evaluate.
+        secret_indices : array of Int
+            Rows of the remaining possible secrets.
+
+        Returns
+        -------
+        sizes : np.ndarray, shape (len(guess_indices), num_feedbacks)
+            sizes[g, f] is the amount of secrets answering f to guess g.
+
+        '''
+        guess_indices = np.asarray(guess_indices)
+        P = self.num_feedbacks
+        sizes = np.empty((len(guess_indices), P), dtype=np.int64)
+        step = max(1, _BLOCK_ENTRIES // max(1, len(secret_indices)))
+        for start in range(0, len(guess_indices), step):
+            block = guess_indices[start:start + step]
+            fb = self.feedback(block, secret_indices).astype(np.intp)
+            fb += (np.arange(len(block))*P)[:, None]
+            sizes[start:start + len(block)] = np.bincount(fb.ravel(), minlength=len(block)*P).reshape(len(block), P)
+        return sizes
+
+
+@lru_cache(maxsize=8)
+def get_feedback_table(num_slots, pin_amount):
+    '''
+    Returns the (shared) FeedbackTable for MM(num_slots, pin_amount).
+    '''
+    return FeedbackTable(num_slots, pin_amount)
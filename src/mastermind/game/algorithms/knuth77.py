@@ -1,89 +1,142 @@
 from abc import ABC
-from itertools import product
-
+from functools import partial
 import numpy as np
 
-from mastermind.game.classicalgame import _check_input
+from mastermind.game.algorithms.feedback import encode_feedback, get_feedback_table
+from mastermind.game.algorithms.strategies import STRATEGIES, score_moves
+from mastermind.game.algorithms.strategy_cache import DecisionTree, get_decision_tree
 from mastermind.game.game import Game
 
 
-def _score_code(code, max_num, pegs, guesses):
+# Opening moves already computed, keyed by (num_slots, pin_amount, strategy)
+_OPENINGS = dict()
+
+
+def _first_move(num_slots, pin_amount):
     '''
-    Returns the minimum amount of remaining guesses a code can eliminate.
+    Returns Knuth's opening move, i.e. 0011 for MM(4,6): the first half of
+    the slots colour 0, the second half colour 1.
 
     Parameters
     ----------
-    code : List
-        code to score.
-    max_num : Int
-        Largest possible number.
-    pegs : List
-        Different combinations of answer pegs.
-    guesses : List
-        Remaining possible guesses.
+    num_slots : Int
+        Length of the query.
+    pin_amount : Int
+        Number of colours.
 
     Returns
     -------
-    eliminate_min : Int
-        Amount of guesses this score can eliminate.
+    move : Tuple
+        Opening move.
 
     '''
-    eliminate_min = max_num
-    for p in pegs:
-        eliminate = 0
-        for guess in guesses:
-            if p != _check_input(list(code), list(guess)):
-                eliminate += 1
-        eliminate_min = min(eliminate, eliminate_min)
-    return eliminate_min
+    second = min(1, pin_amount - 1)
+    return (0,)*(num_slots//2) + (second,)*(num_slots - num_slots//2)
 
 
-def _generate_pegs(num_slots):
+def _opening_move(table, strategy, select_move):
     '''
-    Generates the different combinations of answer pegs from the length of the
-    query.
+    Returns the row of the opening move: Knuth's 0011 for the minimax
+    strategy, otherwise the best scoring code over the whole code space.
 
     Parameters
     ----------
-    num_slots : length of the query.
+    table : FeedbackTable
+        Table of all codes and their feedback.
+    strategy : Str
+        Name of the strategy.
+    select_move : function (table, codes, guesses) -> Int
+        Rule selecting the move.
 
     Returns
     -------
-    pegs : different combinations of answer pegs.
+    move : Int
+        Row of the opening move.
 
     '''
-    n = num_slots + 1
-    pegs = [(i, j - i) for i in range(n) for j in range(n) if j - i >= 0 and not (i == n - 2 and j - i > 0)]
-    return pegs
+    if strategy == 'minimax':
+        return table.index(_first_move(table.num_slots, table.pin_amount))
+    key = (table.num_slots, table.pin_amount, strategy)
+    if key not in _OPENINGS:
+        everything = np.ones(table.num_codes, dtype=bool)
+        _OPENINGS[key] = select_move(table, everything, everything)
+    return _OPENINGS[key]
 
-def _min_max(self):
+
+def _select_move(table, codes, guesses, strategy='minimax'):
     '''
-    Assigns a score to each remaining code according to the minimum amount
-    of remaining guesses it can eliminate.
+    Selects the next move: the first code with the highest score according
+    to strategy, preferring codes that are still a possible secret.
+
+    Parameters
+    ----------
+    table : FeedbackTable
+        Table of all codes and their feedback.
+    codes : np.ndarray of bool
+        Mask over the table of the codes that can still be played.
+    guesses : np.ndarray of bool
+        Mask over the table of the remaining possible secret codes.
+    strategy : Str
+        Name of the scoring strategy (see strategies.SCORES).
 
     Returns
     -------
-    none.
+    move : Int
+        Row of the selected move.
 
     '''
-    C = len(self._Codes)
-    self._Score = [0]*C
-    for (i,code) in enumerate(self._Codes):
-        self._Score[i] = _score_code(code, C, self._Pegs, self._Guesses)
+    # Select the moves with the highest scores
+    rows = np.flatnonzero(codes)
+    score = score_moves(table, rows, np.flatnonzero(guesses), strategy)
+    best = score == np.max(score)
+
+    # Select a remaining possible key whenever possible
+    consistent = best & guesses[rows]
+    return int(rows[np.argmax(consistent if consistent.any() else best)])
 
 
 class Knuth(Game, ABC):
     '''
     Generalised implementation of Knuth's 5-guess algorithm to solve MM(n,k).
     The 5 guesses only apply to MM(4,6).
+    
+    Set strategy to score the moves differently (see strategies.STRATEGIES),
+    use_strategy_cache to play from a cached decision tree and workers to
+    score the codes in that many worker processes.
     '''
-    _Codes: list = None
-    _Guesses: list = None
-    _Score = list()
-    _Move = list()
-
-    # List of all possible outcomes.
-    _Pegs = None
+    # Masks over the feedback table of the codes that can still be played and
+    # of the remaining possible secret codes, plus scratch space for filtering.
+    _Codes: np.ndarray = None
+    _Guesses: np.ndarray = None
+    _Scratch: np.ndarray = None
+    _Move = None
+
+    # Table of all codes and their feedback.
+    _Table = None
+
+    # Cached decision tree and the current node in it (see strategy_cache).
+    _Tree = None
+    _Node = -1
+    
+    # Name of the scoring strategy and of the tie-breaking rule, both part of
+    # the strategy cache key.
+    strategy = 'minimax'
+    tie_break = 'first-consistent'
+    
+    # Whether to print the moves and feedback.
+    verbose = True
+
+    def __init__(self, *args, strategy=None, use_strategy_cache=False, workers=None, **kwargs):
+        # Set before initialising the game, since that may already start playing
+        if strategy is not None:
+            if strategy not in STRATEGIES:
+                raise ValueError("Unknown strategy %s, choose one of %s" % (strategy, ", ".join(STRATEGIES)))
+            self.strategy = strategy
+        if use_strategy_cache and self.strategy == 'random':
+            raise ValueError("The random strategy cannot be cached")
+        self.use_strategy_cache = use_strategy_cache
+        self.workers = workers
+        super(Knuth, self).__init__(*args, **kwargs)
 
     def get_input(self):
         '''
@@ -100,9 +153,22 @@ class Knuth(Game, ABC):
         if self.game_end:
             return
         
-        'If not done yet, generate all possible combinations of answer pegs'
-        if self._Pegs is None:
-            self._Pegs = _generate_pegs(self.num_slots)
+        'If not done yet, get the table of all codes and their feedback'
+        if self._Table is None:
+            self._Table = get_feedback_table(self.num_slots, self.pin_amount)
+        
+        'Score the codes in this process or, if asked for, in a pool of worker processes'
+        select_move = _select_move
+        if self.workers is not None:
+            from mastermind.game.algorithms.minimax_pool import get_minimax_pool
+            select_move = get_minimax_pool(self.num_slots, self.pin_amount, self.workers).select_move
+        select_move = partial(select_move, strategy=self.strategy)
+        
+        'If asked for, look up (or build once) the complete strategy'
+        if self.use_strategy_cache and self._Tree is None:
+            self._Tree = get_decision_tree(self._Table, '%s-%s' % (self.strategy, self.tie_break),
+                                           _opening_move(self._Table, self.strategy, select_move),
+                                           select_move)
 
         '''
         First move and generate list of remaining codes and guesses, after
@@ -110,39 +176,46 @@ class Knuth(Game, ABC):
         '''
         if self.moves_used == 0:
             # Initialise a list with all possible codes and the list with remaining possible secret codes
-            self._Codes = list(product(range(0, self.pin_amount), repeat=self.num_slots))
+            self._Codes = np.ones(self._Table.num_codes, dtype=bool)
             self._Guesses = self._Codes.copy()
-
-            # First move is always 0011
-            move = (0, 0, 1, 1)
+            self._Scratch = np.empty(self._Table.num_codes, dtype=bool)
+
+            # First move is always 0011 (for minimax)
+            if self.strategy == 'random':
+                move = np.random.randint(self._Table.num_codes)
+            else:
+                move = _opening_move(self._Table, self.strategy, select_move)
+            self._Node = DecisionTree.ROOT
+        elif self._Tree is not None and self._Node != -1:
+            # Look the move up in the cached strategy
+            move = self._Tree.move(self._Node)
+        elif self.strategy == 'random':
+            # Play any of the remaining possible secrets
+            remaining = np.flatnonzero(self._Guesses if self._Guesses.any() else self._Codes)
+            move = int(np.random.choice(remaining))
         else:
-            # Generate the scores via minmax method
-            _min_max(self)
-
-            # Select the moves with the highest scores
-            move_indices = np.where(self._Score == np.max(self._Score))[0]
-            possible_moves = [self._Codes[i] for i in move_indices]
-
-            # Select a remaining possible key whenever possible
-            move = possible_moves[0]
-            for m in possible_moves:
-                if m in self._Guesses:
-                    move = m
-                    break
+            # Generate the scores (via minmax method by default) and select the best move
+            move = select_move(self._Table, self._Codes, self._Guesses)
         
         # Print move for user's satisfaction
-        print('Move ', self.moves_used + 1, ': ', move)
+        if self.verbose:
+            print('Move ', self.moves_used + 1, ': ', self._Table.code(move))
 
         # Remove selected move from possible codes and play said move
-        self._Codes.remove(move)
+        self._Codes[move] = False
         self._Move = move
-        return list(move)
+        return list(self._Table.code(move))
 
     def give_feedback(self, correct, semi_correct):
-        print("Received feedback: ", correct, "blacks and", semi_correct, "whites")
+        if self.verbose:
+            print("Received feedback: ", correct, "blacks and", semi_correct, "whites")
 
         # Remove from the remaining possible codes, those codes who do not give the same response if the previous move
         # would be the code
-        self._Guesses = [guess for guess in self._Guesses if (correct, semi_correct) == _check_input(guess, self._Move)]
-
-    
+        np.equal(self._Table.feedback_row(self._Move), encode_feedback(correct, semi_correct, self.num_slots),
+                 out=self._Scratch)
+        self._Guesses &= self._Scratch
+        
+        # Follow the cached strategy; on feedback it does not know (e.g. noise) fall back to minmaxing
+        if self._Tree is not None and self._Node != -1:
+            self._Node = self._Tree.child(self._Node, encode_feedback(correct, semi_correct, self.num_slots))
@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""
+Process-pool minmax (or other strategy) scoring for large Mastermind spaces.
+
+The playable codes are split into contiguous shards, one per worker. The
+mask of remaining possible secrets is shared with the workers through shared
+memory, every worker scores its shard and only the best score of each shard
+travels back, after which the shards are reduced to the same move the serial
+Knuth._select_move would pick.
+"""
+import atexit
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from mastermind.game.algorithms.feedback import FeedbackTable
+from mastermind.game.algorithms.strategies import score_moves
+
+
+# Pools already started in this process, keyed by (num_slots, pin_amount, workers)
+_POOLS = dict()
+
+# Per worker process: the code table
+_worker_table = None
+
+
+def _init_worker(num_slots, pin_amount):
+    global _worker_table
+    # Only the code table is needed, the feedback is scored on demand
+    _worker_table = FeedbackTable(num_slots, pin_amount, max_entries=0)
+
+
+def _score_shard(shard, guesses_name, strategy):
+    '''
+    Scores one shard of playable codes against the shared remaining secrets.
+
+    Parameters
+    ----------
+    shard : np.ndarray
+        Rows of the playable codes in this shard.
+    guesses_name : Str
+        Name of the shared memory block holding the mask of remaining secrets.
+    strategy : Str
+        Name of the scoring strategy.
+
+    Returns
+    -------
+    best : Int
+        Highest score in this shard.
+    first : Int
+        Position (in shard) of the first code with the highest score.
+    first_consistent : Int
+        Position of the first code with the highest score that is still a
+        possible secret, or -1 if there is none.
+
+    '''
+    shm = SharedMemory(name=guesses_name)
+    try:
+        guesses = np.ndarray((_worker_table.num_codes,), dtype=bool, buffer=shm.buf)
+        score = score_moves(_worker_table, shard, np.flatnonzero(guesses), strategy)
+        best_codes = score == np.max(score)
+        consistent = best_codes & guesses[shard]
+        first_consistent = int(np.argmax(consistent)) if consistent.any() else -1
+        result = (np.max(score), int(np.argmax(best_codes)), first_consistent)
+        del guesses
+    finally:
+        shm.close()
+    return result
+
+
+class MinimaxPool():
+    '''
+    Pool of worker processes scoring the minmax of MM(n,k) in parallel.
+    '''
+
+    def __init__(self, num_slots, pin_amount, workers=None):
+        self.workers = os.cpu_count() if workers is None else workers
+        self._executor = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                             initargs=(num_slots, pin_amount))
+
+    def select_move(self, table, codes, guesses, strategy='minimax'):
+        '''
+        Selects the next move like Knuth's _select_move, scoring the codes
+        in parallel.
+
+        Parameters
+        ----------
+        table : FeedbackTable
+            Table of all codes (unused; every worker holds its own).
+        codes : np.ndarray of bool
+            Mask over the table of the codes that can still be played.
+        guesses : np.ndarray of bool
+            Mask over the table of the remaining possible secret codes.
+        strategy : Str
+            Name of the scoring strategy.
+
+        Returns
+        -------
+        move : Int
+            Row of the selected move.
+
+        '''
+        # Share the mask of remaining secrets
+        shm = SharedMemory(create=True, size=guesses.nbytes)
+        try:
+            np.ndarray(guesses.shape, dtype=bool, buffer=shm.buf)[:] = guesses
+            shards = [shard for shard in np.array_split(np.flatnonzero(codes), self.workers) if len(shard) > 0]
+            futures = [self._executor.submit(_score_shard, shard, shm.name, strategy) for shard in shards]
+            results = [future.result() for future in futures]
+        finally:
+            shm.close()
+            shm.unlink()
+
+        # Reduce: first code with the highest score, preferring possible secrets
+        best = max(result[0] for result in results)
+        for (shard, (score, _, first_consistent)) in zip(shards, results):
+            if score == best and first_consistent != -1:
+                return int(shard[first_consistent])
+        for (shard, (score, first, _)) in zip(shards, results):
+            if score == best:
+                return int(shard[first])
+
+    def close(self):
+        self._executor.shutdown()
+
+
+def get_minimax_pool(num_slots, pin_amount, workers=None):
+    '''
+    Returns the (shared) MinimaxPool for MM(num_slots, pin_amount) with the
+    given amount of workers (default: all cores).
+    '''
+    key = (num_slots, pin_amount, workers)
+    if key not in _POOLS:
+        _POOLS[key] = MinimaxPool(num_slots, pin_amount, workers)
+    return _POOLS[key]
+
+
+@atexit.register
+def _close_pools():
+    for pool in _POOLS.values():
+        pool.close()
+    _POOLS.clear()
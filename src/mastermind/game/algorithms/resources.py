@@ -0,0 +1,306 @@
+# -*- coding: utf-8 -*-
+"""
+Resource estimates of the oracle circuits.
+
+Builds an oracle circuit for MM(n,k) (building is cheap, see
+benchmarks.construction) and counts its qubits, its gates by type in a basis,
+its depth and the memory a statevector simulation of it needs, without
+transpiling or running it. Every distinct gate is decomposed only once, so
+this also works for circuits that take far too long to transpile. Run from the
+src directory for a table over a grid of sizes, e.g.
+
+    python -m mastermind.game.algorithms.resources -n 4 6 8 -k 4 6 8 --circuits check_v2 find_colours
+"""
+import argparse
+import json
+from collections import Counter
+
+import numpy as np
+from qiskit import QuantumRegister, ClassicalRegister, QuantumCircuit
+
+import mastermind.game.algorithms.Mastermind_Oracle as oracle
+from mastermind.game.algorithms.Find_Colours import build_find_colours_circuit
+from mastermind.game.algorithms.Find_Colour_Positions import build_find_colour_positions_circuit, build_find_colour_positions_alt_circuit
+
+# Basis the gates are counted in
+BASIS = ('u', 'cx', 'id')
+
+# Instructions that are counted but never decomposed
+_PRIMITIVES = ('measure', 'reset')
+
+# Bytes per amplitude of a (complex128) statevector
+AMPLITUDE_BYTES = 16
+
+# Circuits that can be estimated: the a-oracle, the b-oracle versions alone,
+# the check circuit of QuantumGame per b-oracle version and the Buhrman circuits
+CIRCUITS = ('a', *('b_%s' % version for version in oracle.B_ORACLES),
+            *('check_%s' % version for version in oracle.B_ORACLES),
+            'find_colours', 'find_colour_positions', 'find_colour_positions_alt')
+
+
+def oracle_registers(circuit_name, num_slots, colour_amount, secret=None):
+    '''
+    Returns the registers of an oracle circuit and the function that builds
+    it on a circuit with those registers.
+
+    Parameters
+    ----------
+    circuit_name : Str
+        One of CIRCUITS.
+    num_slots : Int
+        Length of the secret.
+    colour_amount : Int
+        Number of colours.
+    secret : Int list, optional
+        Secret sequence. The default is a fixed random one.
+
+    Returns
+    -------
+    registers : list of QuantumRegister
+        Quantum registers of the circuit.
+    classical : list of ClassicalRegister
+        Classical registers of the circuit.
+    build : function (circuit) -> None
+        Appends the oracle (and measurements) to the circuit.
+
+    '''
+    if circuit_name not in CIRCUITS:
+        raise ValueError("Unknown circuit %s, choose one of %s" % (circuit_name, ", ".join(CIRCUITS)))
+
+    logn = int(np.ceil(np.log2(num_slots)))
+    logk = int(np.ceil(np.log2(colour_amount)))
+    if secret is None:
+        secret = list(np.random.RandomState(0).randint(0, colour_amount, size=num_slots))
+
+    q = QuantumRegister(num_slots*logk, 'q')
+
+    # Buhrman circuits
+    if circuit_name == 'find_colours':
+        if colour_amount > num_slots:
+            raise ValueError("find_colours needs at most as many colours as slots")
+        (b0, x, b, c, d, e, f) = (QuantumRegister(logk+1, 'b0'), QuantumRegister(colour_amount, 'x'),
+                                  QuantumRegister(logk+1, 'b'), QuantumRegister(logn+1, 'c'),
+                                  QuantumRegister(1, 'd'), QuantumRegister(1, 'e'), QuantumRegister(1, 'f'))
+        classical = [ClassicalRegister(colour_amount, 'cx')]
+        def build(circuit):
+            build_find_colours_circuit(circuit, b0, x, q, b, c, d, e, f, secret)
+            circuit.measure(x, classical[0])
+        return [b0, x, q, b, c, d, e, f], classical, build
+
+    if circuit_name.startswith('find_colour_positions'):
+        x = QuantumRegister(num_slots, 'x')
+        a = QuantumRegister(logk+1, 'a')
+        classical = [ClassicalRegister(num_slots, 'cx')]
+        colour = secret[0]
+        if circuit_name == 'find_colour_positions_alt':
+            b = QuantumRegister(logn+logk+1, 'b')
+            def build(circuit):
+                build_find_colour_positions_alt_circuit(circuit, x, q, a, b, colour, colour_amount, secret)
+                circuit.measure(x, classical[0])
+            return [x, q, a, b], classical, build
+
+        # Against an unused colour if there is one, otherwise against colour 0 with its positions known
+        unused = [clr for clr in range(colour_amount) if clr not in secret]
+        (other, d_positions) = (unused[0], None) if unused else (0, [int(clr == 0) for clr in secret])
+        def build(circuit):
+            build_find_colour_positions_circuit(circuit, x, q, a, colour, other, secret, d_positions)
+            circuit.measure(x, classical[0])
+        return [x, q, a], classical, build
+
+    # Mastermind oracles
+    a = QuantumRegister(logn+1, 'a')
+    b = QuantumRegister(logn+1, 'b')
+    version = circuit_name.split('_')[-1]
+    do_a = circuit_name == 'a' or circuit_name.startswith('check')
+    do_b = circuit_name != 'a'
+
+    registers = [q, a] if do_a else [q]
+    if do_b:
+        registers.append(b)
+        if version in ('v2', 'fused', 'poly'):
+            registers.append(QuantumRegister(logn+1, 'c'))
+        if version in ('v2', 'fused'):
+            registers.append(QuantumRegister(1, 'd'))
+    classical = [ClassicalRegister(len(register), 'c' + register.name) for register in (a, b)
+                 if register in registers]
+
+    def build(circuit):
+        if do_a:
+            oracle.build_mastermind_a_circuit(circuit, q, a, secret)
+        if do_b:
+            ancillas = registers[registers.index(b)+1:]
+            if version == 'v1':
+                oracle.build_mastermind_b_circuit(circuit, q, b, secret)
+            elif version == 'v2':
+                oracle.build_mastermind_b_circuit_v2(circuit, q, b, *ancillas, secret)
+            elif version == 'fused':
+                oracle.build_mastermind_b_circuit_fused(circuit, q, b, *ancillas, secret)
+            else:
+                oracle.build_mastermind_b_circuit_poly(circuit, q, b, *ancillas, secret)
+        for (register, creg) in zip([r for r in (a, b) if r in registers], classical):
+            circuit.measure(register, creg)
+    return registers, classical, build
+
+
+def build_oracle_circuit(circuit_name, num_slots, colour_amount, secret=None):
+    '''
+    Builds an oracle circuit (see oracle_registers for the arguments).
+
+    Returns
+    -------
+    circuit : QuantumCircuit
+
+    '''
+    (registers, classical, build) = oracle_registers(circuit_name, num_slots, colour_amount, secret)
+    circuit = QuantumCircuit(*registers, *classical)
+    build(circuit)
+    return circuit
+
+
+def _gate_key(operation):
+    '''
+    Returns the key of a gate: its type and parameters for library gates
+    (equal keys decompose equally), the id of the object otherwise.
+    '''
+    if type(operation).__module__.startswith('qiskit.circuit.library'):
+        return (type(operation), operation.num_qubits, tuple(str(p) for p in operation.params),
+                getattr(operation, 'ctrl_state', None))
+    return id(operation)
+
+
+def _resources(operation, basis, memo):
+    '''
+    Returns the gate counts (Counter) and depth of one operation in basis.
+    '''
+    if basis is None or operation.name in basis or operation.name in _PRIMITIVES:
+        return Counter({operation.name: 1}), 1
+
+    key = _gate_key(operation)
+    if key not in memo:
+        definition = operation.definition
+        if definition is None:
+            raise ValueError("Cannot decompose %s into %s" % (operation.name, ", ".join(basis)))
+        # Keep the operation alive, so that its id is not reused
+        memo[key] = (*_circuit_resources(definition, basis, memo), operation)
+    return memo[key][:2]
+
+
+def _circuit_resources(circuit, basis, memo):
+    '''
+    Returns the gate counts (Counter) and depth of a circuit in basis. The
+    depth adds up the depth of the decomposition of every gate along the
+    longest path; transpile may decompose differently, so it is an estimate.
+    '''
+    counts = Counter()
+    bits = {bit: i for (i, bit) in enumerate(circuit.qubits + circuit.clbits)}
+    levels = np.zeros(len(bits), dtype=np.int64)
+    for (operation, qargs, cargs) in circuit.data:
+        if operation.name == 'barrier':
+            continue
+        (gate_counts, gate_depth) = _resources(operation, basis, memo)
+        counts.update(gate_counts)
+        involved = [bits[bit] for bit in (*qargs, *cargs)]
+        levels[involved] = levels[involved].max() + gate_depth
+    return counts, int(levels.max()) if len(levels) > 0 else 0
+
+
+def estimate_circuit(circuit, basis=BASIS):
+    '''
+    Estimates the resources of a circuit without transpiling it.
+
+    Parameters
+    ----------
+    circuit : QuantumCircuit
+        Circuit to estimate.
+    basis : tuple of Str, optional
+        Gates to count in; every other gate is decomposed by its definition.
+        None counts the gates as appended by the oracles, which is fast for
+        any size (the definitions of gates with many controls grow
+        exponentially, e.g. in the v1 b-oracle).
+
+    Returns
+    -------
+    resources : dict
+        Number of qubits and clbits, gate counts by type, total gates, CX
+        gates, (estimated) depth and statevector memory in bytes.
+
+    '''
+    (counts, depth) = _circuit_resources(circuit, basis, dict())
+    return {
+        'qubits': circuit.num_qubits,
+        'clbits': circuit.num_clbits,
+        'gates': dict(sorted(counts.items())),
+        'size': sum(count for (name, count) in counts.items() if name != 'measure'),
+        'cx': counts.get('cx', 0),
+        'depth': depth,
+        'statevector_bytes': AMPLITUDE_BYTES*2**circuit.num_qubits,
+    }
+
+
+def estimate_resources(circuit_name, num_slots, colour_amount, secret=None, basis=BASIS):
+    '''
+    Estimates the resources of an oracle circuit for MM(num_slots,
+    colour_amount) without transpiling or running it.
+
+    Parameters
+    ----------
+    circuit_name : Str
+        One of CIRCUITS.
+    num_slots : Int
+        Length of the secret.
+    colour_amount : Int
+        Number of colours.
+    secret : Int list, optional
+        Secret sequence. The default is a fixed random one; the counts hardly
+        depend on it.
+    basis : tuple of Str, optional
+        Gates to count in (None for the gates as appended, see
+        estimate_circuit).
+
+    Returns
+    -------
+    resources : dict
+        See estimate_circuit, plus the circuit name and size of the game.
+
+    '''
+    circuit = build_oracle_circuit(circuit_name, num_slots, colour_amount, secret)
+    return {'circuit': circuit_name, 'num_slots': num_slots, 'colour_amount': colour_amount,
+            **estimate_circuit(circuit, basis)}
+
+
+def _format_bytes(amount):
+    for unit in ('B', 'KiB', 'MiB', 'GiB', 'TiB', 'PiB'):
+        if amount < 1024:
+            return "%.0f %s" % (amount, unit)
+        amount /= 1024
+    return "%.0f EiB" % amount
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Resource estimates of the oracle circuits.")
+    parser.add_argument('-n', '--num-slots', type=int, nargs='+', default=[2, 3, 4])
+    parser.add_argument('-k', '--colour-amount', type=int, nargs='+', default=[2, 4, 6])
+    parser.add_argument('--circuits', nargs='+', default=['check_v2'], choices=CIRCUITS)
+    parser.add_argument('--no-decompose', action='store_true', help="count the gates as appended by the oracles")
+    parser.add_argument('--json', default=None, help="also write the estimates to this file")
+    args = parser.parse_args()
+    basis = None if args.no_decompose else BASIS
+
+    results = []
+    print("%-26s %4s %4s %7s %10s %10s %10s %12s" % ('circuit', 'n', 'k', 'qubits', 'gates', 'cx', 'depth', 'statevector'))
+    for name in args.circuits:
+        for n in args.num_slots:
+            for k in args.colour_amount:
+                if name == 'find_colours' and k > n:
+                    continue
+                r = estimate_resources(name, n, k, basis=basis)
+                results.append(r)
+                print("%-26s %4d %4d %7d %10d %10d %10d %12s" % (name, n, k, r['qubits'], r['size'], r['cx'],
+                                                                r['depth'], _format_bytes(r['statevector_bytes'])))
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    _main()
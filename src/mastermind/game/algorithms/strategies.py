@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Move-scoring strategies for the classical solver.
+
+Every strategy scores a candidate move from the sizes of the partitions it
+induces on the remaining possible secrets (see FeedbackTable.partition_sizes);
+the solver plays the first code with the highest score, preferring codes that
+are still a possible secret. The 'random' strategy skips scoring altogether
+and plays a random possible secret.
+"""
+import numpy as np
+
+
+def minimax(sizes, num_guesses):
+    '''
+    Knuth's worst case: the amount of guesses a move is sure to eliminate.
+    '''
+    return num_guesses - sizes.max(axis=1)
+
+
+def entropy(sizes, num_guesses):
+    '''
+    Information gained by the move: the entropy of its partition.
+
+    Computed as log2(N) - sum(s*log2(s))/N, with the sum over the sorted sizes
+    and rounded, so that moves with equally good partitions get exactly the
+    same score whatever the order of their answers (the solver compares the
+    scores for equality).
+    '''
+    sizes = np.sort(sizes, axis=1).astype(np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        logs = np.where(sizes > 0, np.log2(sizes), 0)
+    total = np.round((sizes*logs).sum(axis=1), 6)
+    num_guesses = max(1, num_guesses)
+    return np.log2(num_guesses) - total/num_guesses
+
+
+def expected_size(sizes, num_guesses):
+    '''
+    Minus the expected amount of guesses remaining after the move.
+    '''
+    return -(sizes.astype(np.float64)**2).sum(axis=1)/max(1, num_guesses)
+
+
+def most_parts(sizes, num_guesses):
+    '''
+    The amount of different answers the move can receive.
+    '''
+    return np.count_nonzero(sizes, axis=1)
+
+
+# Scoring strategies by name
+SCORES = {
+    'minimax': minimax,
+    'entropy': entropy,
+    'expected-size': expected_size,
+    'most-parts': most_parts,
+}
+
+# All strategies, including the ones that do not score
+STRATEGIES = [*SCORES, 'random']
+
+
+def score_moves(table, codes, guesses, strategy='minimax'):
+    '''
+    Scores candidate moves with the given strategy.
+
+    Parameters
+    ----------
+    table : FeedbackTable
+        Table of all codes and their feedback.
+    codes : array of Int
+        Rows of the candidate moves.
+    guesses : array of Int
+        Rows of the remaining possible secret codes.
+    strategy : Str
+        Name of the strategy, a key of SCORES.
+
+    Returns
+    -------
+    score : np.ndarray
+        Score of each candidate, higher is better.
+
+    '''
+    sizes = table.partition_sizes(codes, guesses)
+    return SCORES[strategy](sizes, len(guesses))
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent cache of solver decision trees.
+
+For a fixed MM(n,k) and a deterministic tie-breaking rule the move a solver
+plays only depends on the feedback received so far, so the complete strategy
+can be computed once and stored as a tree. A tree is stored as a single int32
+.npy file (memory-mapped on load) with one row per node:
+
+    [move, child(feedback 0), child(feedback 1), ..., child(feedback P-1)]
+
+where move is a row of the FeedbackTable and child(f) is the node reached
+after receiving encoded feedback f (-1 if that feedback cannot occur or
+wins the game).
+"""
+import os
+from tempfile import NamedTemporaryFile
+
+import numpy as np
+
+from mastermind.game.algorithms.feedback import encode_feedback
+
+
+CACHE_DIR = os.getenv('MASTERMIND_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'mastermind'))
+
+# Version of the tree format and solver logic, part of the file name: bump it
+# whenever the trees a rule builds change, so that old trees are not loaded
+TREE_VERSION = 2
+
+# Trees already loaded in this process, keyed by (num_slots, pin_amount, rule, cache_dir)
+_TREES = dict()
+
+
+class DecisionTree():
+    '''
+    Lookup wrapper around a stored decision tree.
+    '''
+    ROOT = 0
+
+    def __init__(self, nodes):
+        self.nodes = nodes
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def move(self, node):
+        '''
+        Returns the move (row of the FeedbackTable) to play in node.
+        '''
+        return int(self.nodes[node, 0])
+
+    def child(self, node, feedback):
+        '''
+        Returns the node reached after receiving encoded feedback in node,
+        or -1 if the tree does not continue.
+        '''
+        if not 0 <= feedback < self.nodes.shape[1] - 1:
+            return -1
+        return int(self.nodes[node, 1 + feedback])
+
+
+def build_decision_tree(table, first_move, select_move):
+    '''
+    Builds the full decision tree of a deterministic solver.
+
+    Parameters
+    ----------
+    table : FeedbackTable
+        Table of all codes and their feedback.
+    first_move : Int
+        Row of the opening move.
+    select_move : function (table, codes, guesses) -> Int
+        Solver rule picking the next move from the masks (over the table) of
+        the playable codes and of the remaining possible secrets.
+
+    Returns
+    -------
+    nodes : np.ndarray, shape (num_nodes, 1 + table.num_feedbacks), dtype int32
+        The decision tree.
+
+    '''
+    P = table.num_feedbacks
+    win = encode_feedback(table.num_slots, 0, table.num_slots)
+
+    rows = [[first_move] + [-1]*P]
+    all_codes = np.ones(table.num_codes, dtype=bool)
+    stack = [(0, all_codes, all_codes)]
+    while stack:
+        node, codes, guesses = stack.pop()
+        move = rows[node][0]
+        codes = codes.copy()
+        codes[move] = False
+
+        # Split the remaining secrets on the feedback they give to the move
+        feedback = table.feedback_row(move)
+        for f in np.unique(feedback[guesses]):
+            if f == win:
+                continue
+            child_guesses = guesses & (feedback == f)
+            rows.append([select_move(table, codes, child_guesses)] + [-1]*P)
+            rows[node][1 + f] = len(rows) - 1
+            stack.append((len(rows) - 1, codes, child_guesses))
+
+    return np.array(rows, dtype=np.int32)
+
+
+def tree_path(num_slots, pin_amount, rule, cache_dir=None):
+    '''
+    Returns the file in which the tree of MM(num_slots, pin_amount) with
+    tie-breaking rule is cached.
+    '''
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    return os.path.join(cache_dir, 'tree-v%d-%d-%d-%s.npy' % (TREE_VERSION, num_slots, pin_amount, rule))
+
+
+def get_decision_tree(table, rule, first_move, select_move, cache_dir=None):
+    '''
+    Returns the decision tree for table and rule: from memory if loaded
+    before, from disk if cached before and otherwise by building (and
+    caching) it.
+
+    Parameters
+    ----------
+    table : FeedbackTable
+        Table of all codes and their feedback.
+    rule : Str
+        Name of the solver and its tie-breaking rule, part of the cache key.
+    first_move : Int
+        Row of the opening move.
+    select_move : function (table, codes, guesses) -> Int
+        Solver rule, see build_decision_tree.
+    cache_dir : Str, optional
+        Directory of the cache. The default is CACHE_DIR.
+
+    Returns
+    -------
+    tree : DecisionTree
+
+    '''
+    cache_dir = CACHE_DIR if cache_dir is None else cache_dir
+    key = (table.num_slots, table.pin_amount, rule, cache_dir)
+    if key in _TREES:
+        return _TREES[key]
+
+    path = tree_path(table.num_slots, table.pin_amount, rule, cache_dir)
+    if os.path.exists(path):
+        nodes = np.load(path, mmap_mode='r')
+    else:
+        nodes = build_decision_tree(table, first_move, select_move)
+
+        # Write to a temporary file first, so that concurrent runs never read a half-written tree
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with NamedTemporaryFile(dir=os.path.dirname(path), suffix='.npy', delete=False) as f:
+            np.save(f, nodes)
+        os.replace(f.name, path)
+
+    _TREES[key] = DecisionTree(nodes)
+    return _TREES[key]
@@ -5,6 +5,102 @@ import numpy as np
 from .game import Game
 
 
+# Upper bound on the amount of temporary entries used per chunk by iter_check_inputs.
+CHUNK_ENTRIES = 2**22
+
+
+def _colour_histograms(codes, pin_amount):
+    '''
+    Counts how often each colour occurs in each code.
+
+    Parameters
+    ----------
+    codes : np.ndarray, shape (N, num_slots)
+    pin_amount : Int.
+
+    Returns
+    -------
+    histograms : np.ndarray, shape (N, pin_amount).
+
+    '''
+    return np.stack([(codes == clr).sum(axis=1) for clr in range(pin_amount)], axis=1)
+
+
+def iter_check_inputs(codes, secrets, pin_amount=None, chunk_size=None):
+    '''
+    Streams the black and white pins of all codes against all secrets, a
+    chunk of codes at a time, so that huge code spaces fit in memory.
+    
+    Parameters
+    ----------
+    codes : ARRAY, shape (N, num_slots).
+    secrets : ARRAY, shape (M, num_slots).
+    pin_amount : INT, optional
+        Number of colours. The default is the largest colour used plus one.
+    chunk_size : INT, optional
+        Number of codes per chunk. The default keeps each chunk below
+        CHUNK_ENTRIES temporary entries.
+
+    Yields
+    ------
+    start : INT
+        Row of the first code in this chunk.
+    correct : ARRAY, shape (chunk, M).
+    semi_correct : ARRAY, shape (chunk, M).
+
+    '''
+    codes = np.atleast_2d(np.asarray(codes))
+    secrets = np.atleast_2d(np.asarray(secrets))
+    if codes.shape[1] != secrets.shape[1]:
+        raise ValueError("Codes and secrets must have the same number of slots")
+    if pin_amount is None:
+        pin_amount = int(max(codes.max(initial=0), secrets.max(initial=0))) + 1
+    if chunk_size is None:
+        chunk_size = max(1, CHUNK_ENTRIES // max(1, len(secrets)*max(codes.shape[1], pin_amount)))
+    
+    hist_secrets = _colour_histograms(secrets, pin_amount)
+    for start in range(0, len(codes), chunk_size):
+        chunk = codes[start:start + chunk_size]
+        
+        # Blacks are the equal positions, blacks plus whites the per-colour histogram minima
+        correct = (chunk[:, None, :] == secrets[None, :, :]).sum(axis=2)
+        total = np.minimum(_colour_histograms(chunk, pin_amount)[:, None, :], hist_secrets[None, :, :]).sum(axis=2)
+        
+        yield start, correct, total - correct
+
+
+def check_inputs(codes, secrets, pin_amount=None, chunk_size=None):
+    '''
+    Checks all given codes against all given secrets and returns the black
+    and white pins according to the rules of Mastermind.
+    
+    Parameters
+    ----------
+    codes : ARRAY, shape (N, num_slots).
+    secrets : ARRAY, shape (M, num_slots).
+    pin_amount : INT, optional
+        Number of colours. The default is the largest colour used plus one.
+    chunk_size : INT, optional
+        Number of codes scored at once, see iter_check_inputs.
+
+    Returns
+    -------
+    correct : ARRAY, shape (N, M).
+    semi_correct : ARRAY, shape (N, M).
+
+    '''
+    codes = np.atleast_2d(np.asarray(codes))
+    secrets = np.atleast_2d(np.asarray(secrets))
+    
+    correct = np.empty((len(codes), len(secrets)), dtype=np.int64)
+    semi_correct = np.empty((len(codes), len(secrets)), dtype=np.int64)
+    for (start, c, s) in iter_check_inputs(codes, secrets, pin_amount, chunk_size):
+        correct[start:start + len(c)] = c
+        semi_correct[start:start + len(s)] = s
+
+    return correct, semi_correct
+
+
 def _check_input(code_list, sequence):
     '''
     Checks the given code against the secret sequence and returns the black
@@ -17,35 +113,21 @@ def _check_input(code_list, sequence):
 
     Returns
     -------
-    correct : LIST.
-    semi_correct : LIST.
+    correct : INT.
+    semi_correct : INT.
 
     '''
     
-    blacks = set()
-    whites = set()
-
-    correct = 0
-    semi_correct = 0
-    for (pos, num) in enumerate(code_list):
-        if sequence[pos] == num:
-            blacks.add(pos)
-            correct += 1
-    for (i, num1) in enumerate(code_list):
-        if i not in blacks:
-            for (j, num2) in enumerate(sequence):
-                if j not in blacks and j not in whites and i != j and num1 == num2:
-                    whites.add(j)
-                    semi_correct += 1
-                    break
+    correct, semi_correct = check_inputs([code_list], [sequence])
 
-    return correct, semi_correct
+    return int(correct[0, 0]), int(semi_correct[0, 0])
 
 
 class ClassicalGame(Game, ABC):
 
     def check_input(self, int_list, sequence):
-        return _check_input(int_list, sequence)
+        correct, semi_correct = check_inputs([int_list], [sequence], self.pin_amount)
+        return int(correct[0, 0]), int(semi_correct[0, 0])
 
     def random_sequence(self):
         # Choose numbers between 0 and pin_amount (do this num_slots times)
@@ -1,5 +1,7 @@
 from abc import abstractmethod, ABC
 
+from experiment.profiling import phase
+
 
 class Game(ABC):
 
@@ -34,24 +36,29 @@ class Game(ABC):
         if self.game_end:
             return
 
-        self.moves_used += 1
+        with phase('do_input'):
+            self.moves_used += 1
 
-        result = (correct, semi_correct) = self.check_input(int_list, self.sequence)
-        if result == (self.num_slots, 0):
-            self.won(self.moves_used, self.sequence)
-            self.game_end = True
-            return
-        if self.moves_used == self.turns:
-            self.lost(self.sequence)
-            self.game_end = True
-            return
+            with phase('check_input'):
+                result = (correct, semi_correct) = self.check_input(int_list, self.sequence)
+            if result == (self.num_slots, 0):
+                self.won(self.moves_used, self.sequence)
+                self.game_end = True
+                return
+            if self.moves_used == self.turns:
+                self.lost(self.sequence)
+                self.game_end = True
+                return
 
-        self.give_feedback(correct, semi_correct)
+            self.give_feedback(correct, semi_correct)
 
     def do_move(self, sequence):
-        pins = self.get_input()
-        result = (correct, semi_correct) = self.check_input(pins, sequence)
-        self.give_feedback(correct, semi_correct)
+        with phase('do_move'):
+            with phase('solver'):
+                pins = self.get_input()
+            with phase('check_input'):
+                result = (correct, semi_correct) = self.check_input(pins, sequence)
+            self.give_feedback(correct, semi_correct)
 
         return result == (self.num_slots, 0)
 
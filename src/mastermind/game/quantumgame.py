@@ -2,18 +2,28 @@ from abc import ABC
 import numpy as np
 import mastermind.game.algorithms.Mastermind_Oracle as oracle
 from qiskit import QuantumRegister, ClassicalRegister, QuantumCircuit
+from qiskit.circuit import ParameterVector
 
+from experiment.profiling import phase
 from experiment.qiskit_experiment import QiskitExperiment
+from mastermind.arithmetic.gates import AncillaPool, set_ancilla_pool
 from .game import Game
 
 class QuantumGame(Game, ABC):
-    def __init__(self, turns=10, num_slots=4, colour_amount=6, ask_input=True, do_v2_b_oracle=True):
+    def __init__(self, turns=10, num_slots=4, colour_amount=6, ask_input=True, do_v2_b_oracle=True, experiment=None, ancillas=0,
+                 do_fused_b_oracle=False, b_oracle=None):
         # Get some relevant numbers
         self.amount_colour_qubits = int(np.ceil(np.log2(colour_amount)))
         self.amount_answer_qubits = int(np.ceil(np.log2(num_slots))) + 1
         
-        # Save input setting
-        self.do_v2_b_oracle = do_v2_b_oracle
+        # Save input setting; b_oracle names the b-oracle version, otherwise the flags choose it
+        if b_oracle is None:
+            b_oracle = 'fused' if do_fused_b_oracle else 'v2' if do_v2_b_oracle else 'v1'
+        if b_oracle not in oracle.B_ORACLES:
+            raise ValueError("Unknown b-oracle %s, choose one of %s" % (b_oracle, ", ".join(oracle.B_ORACLES)))
+        self.b_oracle = b_oracle
+        self.do_v2_b_oracle = b_oracle == 'v2'
+        self.do_fused_b_oracle = b_oracle == 'fused'
         
         # Query register
         self.q = QuantumRegister(self.amount_colour_qubits * num_slots, 'q')
@@ -21,64 +31,63 @@ class QuantumGame(Game, ABC):
         # Answer pin registers
         self.a = QuantumRegister(self.amount_answer_qubits, 'a')
         self.b = QuantumRegister(self.amount_answer_qubits, 'b')
-        if self.do_v2_b_oracle:
-            self.c = QuantumRegister(self.amount_answer_qubits, 'c')
-            self.d = QuantumRegister(1, 'd')
+        self.c = QuantumRegister(self.amount_answer_qubits, 'c') if b_oracle != 'v1' else None
+        self.d = QuantumRegister(1, 'd') if b_oracle in ('v2', 'fused') else None
+        
+        # Clean ancillas the multi-controlled gates of the oracles may borrow (see arithmetic.gates)
+        self.anc = QuantumRegister(ancillas, 'anc') if ancillas > 0 else None
         self.classical_a = ClassicalRegister(self.amount_answer_qubits, 'ca')
         self.classical_b = ClassicalRegister(self.amount_answer_qubits, 'cb')
         
-        # Build circuit from registers
-        if self.do_v2_b_oracle:
-            self.circuit = QuantumCircuit(self.q, self.a, self.b, self.c, self.d, self.classical_a, self.classical_b)
-        else:
-            self.circuit = QuantumCircuit(self.q, self.a, self.b, self.classical_a, self.classical_b)
+        # Query parameters; the check circuit is built once per secret
+        self.query_parameters = ParameterVector('query', len(self.q))
+        self.circuit = None
+        self._template_secret = None
         
-        # Set up qiskit experiment
-        self.experiment = QiskitExperiment()
+        # Set up qiskit experiment (or share the given one)
+        self.experiment = QiskitExperiment() if experiment is None else experiment
         
         # Initialise Mastermind
         super(QuantumGame, self).__init__(turns, num_slots, colour_amount, ask_input)
 
 
     def check_input(self, query, secret_sequence):
-        # If there is no check circuit:
-        if self.circuit.size() == 0:
-            # Build check circuit
-            oracle.build_mastermind_a_circuit(self.circuit, self.q, self.a, secret_sequence)
-            if self.do_v2_b_oracle:
-                oracle.build_mastermind_b_circuit_v2(self.circuit, self.q, self.b, self.c, self.d, secret_sequence)
-            else:
-                oracle.build_mastermind_b_circuit(self.circuit, self.q, self.b, secret_sequence)
-            # Measure registers a and b
-            self.circuit.measure(self.a, self.classical_a)
-            self.circuit.measure(self.b, self.classical_b)
+        return self.check_inputs([query], secret_sequence)[0]
+
+
+    def check_inputs(self, queries, secret_sequence):
+        '''
+        Checks many queries against secret_sequence in a single job.
+
+        Returns
+        -------
+        feedback : list of (Int, Int)
+            Correct and semi-correct pins of every query.
+
+        '''
+        # If there is no check circuit (for this secret):
+        if self._template_secret != tuple(secret_sequence):
+            with phase('build'):
+                self._build_template(secret_sequence)
         
-        # Prepare q register in query
+        # Run the circuit once per query
+        result = self.experiment.run(self.circuit, 1, parameter_binds=[self._query_binds(query) for query in queries])
+        with phase('parse'):
+            return [self._read_feedback(result.get_counts(i)) for i in range(len(queries))]
+
+
+    def _query_binds(self, query):
+        # Bind the query: an X rotation of pi on every 1-bit of the q register
         binary_query = [bin(q)[2:].zfill(self.amount_colour_qubits) for q in query]
-        if self.do_v2_b_oracle:
-            prep_q = QuantumCircuit(self.q, self.a, self.b, self.c, self.d, self.classical_a, self.classical_b)
-        else:
-            prep_q = QuantumCircuit(self.q, self.a, self.b, self.classical_a, self.classical_b)
-        for (i,binary) in enumerate(binary_query):
-            for (j,bit) in enumerate(binary[::-1]):
-                if bit == '1':
-                    prep_q.x(self.q[i*self.amount_colour_qubits + j])
-                else:
-                    prep_q.i(self.q[i*self.amount_colour_qubits + j])
-        
-        
-        # Finish circuit with q prepped in query
-        self.circuit = prep_q + self.circuit
-        
-        # Run the circuit
-        result = self.experiment.run(self.circuit, 1)
-        counts = result.get_counts(self.circuit)
+        bits = [int(bit) for binary in binary_query for bit in binary[::-1]]
+        return {parameter: np.pi*bit for (parameter, bit) in zip(self.query_parameters, bits)}
+
+
+    @staticmethod
+    def _read_feedback(counts):
         meas_ab = list(counts.keys())[0]
         meas_ab = meas_ab.split()
         
-        # add prep_q again to erase its effect XX = I
-        self.circuit = prep_q + self.circuit
-        
         a = int(meas_ab[1], 2)
         b = int(meas_ab[0], 2)
         
@@ -88,10 +97,72 @@ class QuantumGame(Game, ABC):
         return correct, semi_correct
 
 
+    def _build_template(self, secret_sequence):
+        '''
+        Builds the check circuit for secret_sequence once: a parameterised
+        preparation of the q register followed by the oracles and the
+        measurements, so that every query only binds the parameters.
+        '''
+        
+        # Build circuit from registers
+        ancilla_registers = [register for register in (self.c, self.d, self.anc) if register is not None]
+        self.circuit = QuantumCircuit(self.q, self.a, self.b, *ancilla_registers, self.classical_a, self.classical_b)
+        
+        # Prepare q register in query (RX(pi) = X up to global phase, RX(0) = I)
+        for (parameter, qubit) in zip(self.query_parameters, self.q):
+            self.circuit.rx(parameter, qubit)
+        
+        # Build check circuit, borrowing from the ancilla register if there is one
+        previous = set_ancilla_pool(None if self.anc is None else AncillaPool(self.anc))
+        try:
+            oracle.build_mastermind_a_circuit(self.circuit, self.q, self.a, secret_sequence)
+            if self.b_oracle == 'poly':
+                oracle.build_mastermind_b_circuit_poly(self.circuit, self.q, self.b, self.c, secret_sequence)
+            elif self.b_oracle == 'fused':
+                oracle.build_mastermind_b_circuit_fused(self.circuit, self.q, self.b, self.c, self.d, secret_sequence)
+            elif self.b_oracle == 'v2':
+                oracle.build_mastermind_b_circuit_v2(self.circuit, self.q, self.b, self.c, self.d, secret_sequence)
+            else:
+                oracle.build_mastermind_b_circuit(self.circuit, self.q, self.b, secret_sequence)
+        finally:
+            set_ancilla_pool(previous)
+        # Measure registers a and b
+        self.circuit.measure(self.a, self.classical_a)
+        self.circuit.measure(self.b, self.classical_b)
+        
+        self._template_secret = tuple(secret_sequence)
+
+
     def random_sequence(self):
         # Choose numbers between 0 and pin_amount (do this num_slots times)
         
         # arr = np.array([0, 0, 1, 1])
         # print("\n\nWATCH OUT: RUNNING WITH HARDCODED STRING %s !!!\n\n" % (arr))
         # return arr
-        return np.random.randint(0, self.pin_amount, size=self.num_slots)
\ No newline at end of file
+        return np.random.randint(0, self.pin_amount, size=self.num_slots)
+
+
+def check_games(games, queries):
+    '''
+    Checks one query for each of many games (e.g. games played side by side)
+    in a single job on the experiment of the first game.
+
+    Parameters
+    ----------
+    games : list of QuantumGame
+        Games, each with its own secret sequence.
+    queries : list
+        Query of every game.
+
+    Returns
+    -------
+    feedback : list of (Int, Int)
+        Correct and semi-correct pins of every game.
+
+    '''
+    for game in games:
+        if game._template_secret != tuple(game.sequence):
+            game._build_template(game.sequence)
+    counts = games[0].experiment.run_batch([game.circuit for game in games], 1,
+                                           parameter_binds=[game._query_binds(query) for (game, query) in zip(games, queries)])
+    return [QuantumGame._read_feedback(c) for c in counts]
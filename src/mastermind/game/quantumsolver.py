@@ -5,9 +5,9 @@ from experiment.qiskit_experiment import QiskitExperiment
 from .game import Game
 
 class QuantumSolverGame(Game, ABC):
-    def __init__(self, turns=10, num_slots=4, colour_amount=4, ask_input=True):
-        # Set up qiskit experiment
-        self.experiment = QiskitExperiment()
+    def __init__(self, turns=10, num_slots=4, colour_amount=4, ask_input=True, experiment=None):
+        # Set up qiskit experiment (or share the given one)
+        self.experiment = QiskitExperiment() if experiment is None else experiment
         
         # Initialise Mastermind
         super(QuantumSolverGame, self).__init__(turns, num_slots, colour_amount, ask_input)
@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Headless batch simulation of the Mastermind solvers.
+
+Plays many games (random secrets or every secret) without any printing or
+input() and reports the distribution of moves, wall time, games per second
+and per-move latency percentiles. Run from the src directory, e.g.
+
+    python -m mastermind.game.simulation --solver knuth -n 4 -k 6 --exhaustive
+"""
+import argparse
+import json
+from abc import ABC
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from time import perf_counter
+
+import numpy as np
+
+from mastermind.game.algorithms.knuth77 import Knuth
+from mastermind.game.algorithms.strategies import STRATEGIES
+from mastermind.game.classicalgame import ClassicalGame
+from mastermind.game.quantumgame import QuantumGame
+from mastermind.game.game import Game
+
+
+class HeadlessGame(Game, ABC):
+    '''
+    Game without any interaction: it records the number of moves and times
+    every move.
+    '''
+    moves = None
+    move_times = None
+
+    def lost(self, sequence):
+        self.moves = None
+
+    def won(self, moves_used, sequence):
+        self.moves = len(self.move_times)
+
+    def give_feedback(self, correct, semi_correct):
+        pass
+
+    def do_move(self, sequence):
+        start = perf_counter()
+        result = super(HeadlessGame, self).do_move(sequence)
+        self.move_times.append(perf_counter() - start)
+        return result
+
+    def play(self, sequence):
+        '''
+        Plays a whole game against the given secret sequence.
+        '''
+        self.sequence = np.asarray(sequence)
+        self.move_times = []
+        self._loop(self.sequence)
+        return self.moves
+
+
+class HeadlessKnuth(Knuth, HeadlessGame, ClassicalGame):
+    verbose = False
+
+
+class HeadlessQnuth(Knuth, HeadlessGame, QuantumGame):
+    verbose = False
+
+
+# Solvers available to the harness, by name
+SOLVERS = {
+    'knuth': HeadlessKnuth,
+    'qnuth': HeadlessQnuth,
+}
+
+
+class SimulationReport():
+    '''
+    Results of a batch of games.
+    '''
+
+    def __init__(self, solver, num_slots, pin_amount, moves, move_times, wall_time):
+        self.solver = solver
+        self.num_slots = num_slots
+        self.pin_amount = pin_amount
+        self.games = len(moves)
+        self.wall_time = wall_time
+        self.games_per_second = self.games/wall_time if wall_time > 0 else float('inf')
+
+        # Moves needed per game, None for a lost game
+        self.moves_distribution = Counter('lost' if m is None else m for m in moves)
+        won = [m for m in moves if m is not None]
+        self.mean_moves = float(np.mean(won)) if won else None
+
+        # Per-move latency in milliseconds
+        self.latency = dict()
+        if move_times:
+            for (p, value) in zip((50, 90, 99, 100), np.percentile(move_times, [50, 90, 99, 100])):
+                self.latency['p%d' % p] = float(value)*1000
+
+    def to_dict(self):
+        return {
+            'solver': self.solver,
+            'num_slots': self.num_slots,
+            'pin_amount': self.pin_amount,
+            'games': self.games,
+            'wall_time': self.wall_time,
+            'games_per_second': self.games_per_second,
+            'mean_moves': self.mean_moves,
+            'moves_distribution': {str(m): c for (m, c) in sorted(self.moves_distribution.items(), key=str)},
+            'latency_ms': self.latency,
+        }
+
+    def __str__(self):
+        lines = ["Solver %s on MM(%d,%d): %d games in %.3f s (%.1f games/s)"
+                 % (self.solver, self.num_slots, self.pin_amount, self.games, self.wall_time, self.games_per_second)]
+        if self.mean_moves is not None:
+            lines.append("Mean moves (won games): %.4f" % self.mean_moves)
+        for (m, c) in sorted(self.moves_distribution.items(), key=str):
+            lines.append("     %s moves: %d" % (m, c))
+        if self.latency:
+            lines.append("Move latency (ms): " + ", ".join("%s %.3f" % item for item in self.latency.items()))
+        return "\n".join(lines)
+
+
+def _play_games(solver, secrets, num_slots, pin_amount, turns, options):
+    '''
+    Plays a game per secret and returns the moves and move times of each.
+    '''
+    moves = []
+    move_times = []
+    for secret in secrets:
+        game = SOLVERS[solver](turns, num_slots, pin_amount, False, **options)
+        moves.append(game.play(secret))
+        move_times.extend(game.move_times)
+    return moves, move_times
+
+
+def simulate(solver='knuth', num_slots=4, pin_amount=6, games=100, exhaustive=False, turns=10,
+             processes=None, seed=None, backend=None, **options):
+    '''
+    Plays a batch of games with the given solver.
+
+    Parameters
+    ----------
+    solver : Str
+        Name of the solver, a key of SOLVERS.
+    num_slots : Int
+        Length of the secret.
+    pin_amount : Int
+        Number of colours.
+    games : Int
+        Number of random secrets to play (ignored when exhaustive).
+    exhaustive : Bool
+        Whether to play every possible secret once.
+    turns : Int
+        Maximum number of moves per game.
+    processes : Int, optional
+        Number of worker processes to spread the games over. The default
+        plays all games in this process.
+    seed : Int, optional
+        Seed for the random secrets.
+    backend : Str, optional
+        Backend of the quantum solvers (see experiment.qiskit_experiment.
+        choose_backend). It is set up once per process.
+    **options :
+        Passed on to the solver (e.g. strategy, use_strategy_cache, workers).
+
+    Returns
+    -------
+    report : SimulationReport
+
+    '''
+    if solver not in SOLVERS:
+        raise ValueError("Unknown solver %s, choose one of %s" % (solver, ", ".join(SOLVERS)))
+
+    if exhaustive:
+        secrets = np.array(list(product(range(pin_amount), repeat=num_slots)))
+    else:
+        secrets = np.random.RandomState(seed).randint(0, pin_amount, size=(games, num_slots))
+
+    if issubclass(SOLVERS[solver], QuantumGame):
+        # Choose the backend once and share it over all games (and processes)
+        from experiment.qiskit_experiment import QiskitExperiment, choose_backend
+        options.setdefault('experiment', QiskitExperiment(choose_backend(backend)))
+
+    start = perf_counter()
+    if processes is None:
+        moves, move_times = _play_games(solver, secrets, num_slots, pin_amount, turns, options)
+    else:
+        moves = []
+        move_times = []
+        with ProcessPoolExecutor(processes) as executor:
+            futures = [executor.submit(_play_games, solver, chunk, num_slots, pin_amount, turns, options)
+                       for chunk in np.array_split(secrets, processes) if len(chunk) > 0]
+            for future in futures:
+                (chunk_moves, chunk_times) = future.result()
+                moves.extend(chunk_moves)
+                move_times.extend(chunk_times)
+    wall_time = perf_counter() - start
+
+    if options.get('strategy') is not None:
+        solver = '%s (%s)' % (solver, options['strategy'])
+    return SimulationReport(solver, num_slots, pin_amount, moves, move_times, wall_time)
+
+
+def _main():
+    parser = argparse.ArgumentParser(description="Headless batch simulation of the Mastermind solvers.")
+    parser.add_argument('--solver', default='knuth', choices=sorted(SOLVERS))
+    parser.add_argument('-n', '--num-slots', type=int, default=4)
+    parser.add_argument('-k', '--pin-amount', type=int, default=6)
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--exhaustive', action='store_true', help="play every possible secret once")
+    parser.add_argument('--turns', type=int, default=10)
+    parser.add_argument('--processes', type=int, default=None, help="spread the games over this many processes")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--backend', default=None, help="backend of the quantum solvers, e.g. LOCAL or CLASSICAL")
+    parser.add_argument('--strategy', default=None, choices=STRATEGIES, help="how the solver scores its moves")
+    parser.add_argument('--strategy-cache', action='store_true', help="play from a cached decision tree")
+    parser.add_argument('--workers', type=int, default=None, help="score each move in this many processes")
+    parser.add_argument('--json', default=None, help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = simulate(args.solver, args.num_slots, args.pin_amount, args.games, args.exhaustive, args.turns,
+                      args.processes, args.seed, args.backend, strategy=args.strategy,
+                      use_strategy_cache=args.strategy_cache, workers=args.workers)
+    print(report)
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(report.to_dict(), f, indent=2)
+
+
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Equivalence tests of the b-oracle versions: QuantumGame gives the classical
+feedback for every version, with and without ancillas, on the classical
+basis-state emulator. Run from the src directory with
+
+    python -m pytest tests
+"""
+from itertools import product
+
+import numpy as np
+import pytest
+
+from experiment.qiskit_experiment import QiskitExperiment
+from mastermind.game.algorithms.Mastermind_Oracle import B_ORACLES
+from mastermind.game.algorithms.resources import estimate_resources
+from mastermind.game.classicalgame import _check_input
+from mastermind.game.quantumgame import QuantumGame
+
+# Clean ancillas of the games with ancillas
+ANCILLAS = 4
+
+
+class _Game(QuantumGame):
+    '''
+    QuantumGame against a given secret, without interaction.
+    '''
+
+    def __init__(self, secret, colour_amount, **kwargs):
+        self.secret = np.asarray(secret)
+        super(_Game, self).__init__(10, len(secret), colour_amount, False, **kwargs)
+
+    def random_sequence(self):
+        return self.secret
+
+    def lost(self, sequence):
+        pass
+
+    def won(self, moves_used, sequence):
+        pass
+
+    def get_input(self):
+        pass
+
+    def give_feedback(self, correct, semi_correct):
+        pass
+
+
+@pytest.fixture(scope='module')
+def experiment():
+    return QiskitExperiment('CLASSICAL')
+
+
+def _cases(num_slots, colour_amount, secrets=None, queries=None, seed=0):
+    '''
+    Returns (secret, queries) pairs: every secret and query, or the given
+    number of random ones.
+    '''
+    codes = [list(code) for code in product(range(colour_amount), repeat=num_slots)]
+    if secrets is None:
+        return [(secret, codes) for secret in codes]
+    rng = np.random.RandomState(seed)
+    return [(codes[i], [codes[j] for j in rng.choice(len(codes), queries, replace=False)])
+            for i in rng.choice(len(codes), secrets, replace=False)]
+
+
+@pytest.mark.parametrize('ancillas', [0, ANCILLAS])
+@pytest.mark.parametrize('b_oracle', B_ORACLES)
+@pytest.mark.parametrize(('num_slots', 'colour_amount', 'secrets', 'queries'), [
+    (2, 2, None, None),
+    (3, 4, 6, 16),
+    (4, 6, 3, 8),
+])
+def test_feedback(experiment, b_oracle, ancillas, num_slots, colour_amount, secrets, queries):
+    for (secret, codes) in _cases(num_slots, colour_amount, secrets, queries):
+        game = _Game(secret, colour_amount, experiment=experiment, b_oracle=b_oracle, ancillas=ancillas)
+        feedback = game.check_inputs(codes, game.sequence)
+        assert feedback == [_check_input(code, secret) for code in codes], (secret, b_oracle)
+
+
+@pytest.mark.parametrize(('num_slots', 'colour_amount'), [(3, 4), (4, 4), (4, 6)])
+def test_fused_fewer_cx(num_slots, colour_amount):
+    fused = estimate_resources('b_fused', num_slots, colour_amount)
+    v2 = estimate_resources('b_v2', num_slots, colour_amount)
+    assert fused['cx'] < v2['cx']
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Equivalence tests of the Buhrman circuit families: a family bound to a
+secret measures the same as the circuit built for that secret, on the
+classical basis-state emulator. Run from the src directory with
+
+    python -m pytest tests
+"""
+from itertools import product
+
+import numpy as np
+import pytest
+
+from experiment.basis_emulator import BasisStateEmulator
+from mastermind.game.algorithms.Buhrman import (build_colour_positions_alt_circuit, build_colour_positions_circuit,
+                                                build_colours_circuit, circuit_family)
+
+SHOTS = 2000
+
+# Maximum total variation distance between the sampled distributions
+TOLERANCE = 0.05
+
+
+def _distribution(circuit, binds=None):
+    emulator = BasisStateEmulator(seed=0)
+    counts = emulator.run(circuit, shots=SHOTS, parameter_binds=None if binds is None else [binds])
+    return {outcome: count/SHOTS for (outcome, count) in counts.result().get_counts(0).items()}
+
+
+def _distance(p, q):
+    return sum(abs(p.get(outcome, 0) - q.get(outcome, 0)) for outcome in set(p) | set(q))/2
+
+
+def _cases(num_slots, num_colours, secret):
+    '''
+    Returns (family, circuit, d_positions) of every circuit Buhrman runs
+    against secret.
+    '''
+    yield (circuit_family('find_colours', num_slots, num_colours, None, None, False),
+           build_colours_circuit(num_slots, num_colours, secret), None)
+    for (c, d) in product(range(num_colours), repeat=2):
+        if c != d:
+            yield (circuit_family('find_colour_positions', num_slots, num_colours, c, d, False),
+                   build_colour_positions_circuit(num_slots, num_colours, c, d, secret), None)
+            if num_slots <= num_colours:
+                d_positions = [int(colour == d) for colour in secret]
+                yield (circuit_family('find_colour_positions', num_slots, num_colours, c, d, True),
+                       build_colour_positions_circuit(num_slots, num_colours, c, d, secret, d_positions),
+                       d_positions)
+    for c in range(num_colours):
+        yield (circuit_family('find_colour_positions_alt', num_slots, num_colours, c),
+               build_colour_positions_alt_circuit(num_slots, num_colours, c, secret), None)
+
+
+@pytest.mark.parametrize(('num_slots', 'num_colours', 'secrets'), [(2, 2, None), (3, 2, None), (3, 3, 6)])
+def test_family_matches_circuit(num_slots, num_colours, secrets):
+    codes = [list(code) for code in product(range(num_colours), repeat=num_slots)]
+    if secrets is not None:
+        codes = [codes[i] for i in np.random.RandomState(0).choice(len(codes), secrets, replace=False)]
+    for secret in codes:
+        for (family, circuit, d_positions) in _cases(num_slots, num_colours, secret):
+            bound = _distribution(family.circuit, family.binds(secret, d_positions))
+            assert _distance(bound, _distribution(circuit)) < TOLERANCE, (secret, circuit.name)
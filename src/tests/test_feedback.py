@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Equivalence tests of the classical feedback engine against the original
+pairwise scorer: the batch scorer, the feedback table and Knuth's vectorised
+move choice give the same feedback and moves. Run from the src directory with
+
+    python -m pytest tests
+"""
+from itertools import product
+
+import numpy as np
+import pytest
+
+from mastermind.game.algorithms.feedback import FeedbackTable, decode_feedback, encode_feedback, score_codes
+from mastermind.game.algorithms.knuth77 import _first_move, _select_move
+from mastermind.game.classicalgame import _check_input, check_inputs
+
+
+def _scalar_check_input(code_list, sequence):
+    '''
+    The original scorer of a single code, with sets and a double loop.
+    '''
+    blacks = set()
+    whites = set()
+
+    correct = 0
+    semi_correct = 0
+    for (pos, num) in enumerate(code_list):
+        if sequence[pos] == num:
+            blacks.add(pos)
+            correct += 1
+    for (i, num1) in enumerate(code_list):
+        if i not in blacks:
+            for (j, num2) in enumerate(sequence):
+                if j not in blacks and j not in whites and i != j and num1 == num2:
+                    whites.add(j)
+                    semi_correct += 1
+                    break
+
+    return correct, semi_correct
+
+
+def _scalar_move(codes, guesses):
+    '''
+    The original minimax move choice over lists of codes: the first code
+    that eliminates the most guesses in the worst case, preferring a
+    remaining guess.
+    '''
+    feedbacks = [[_scalar_check_input(code, guess) for guess in guesses] for code in codes]
+    score = [len(guesses) - max(row.count(f) for f in set(row)) for row in feedbacks]
+    best = [code for (code, s) in zip(codes, score) if s == max(score)]
+    return next((code for code in best if code in guesses), best[0])
+
+
+SIZES = [(2, 3), (3, 3), (3, 4), (4, 3), (4, 4)]
+
+
+@pytest.mark.parametrize('chunk_size', [None, 1, 7])
+@pytest.mark.parametrize(('num_slots', 'pin_amount'), SIZES + [(5, 8)])
+def test_check_inputs_matches_scalar(num_slots, pin_amount, chunk_size):
+    rng = np.random.RandomState(0)
+    codes = rng.randint(0, pin_amount, size=(40, num_slots))
+    secrets = rng.randint(0, pin_amount, size=(30, num_slots))
+    (correct, semi_correct) = check_inputs(codes, secrets, pin_amount, chunk_size)
+    feedback = score_codes(codes, secrets, pin_amount)
+    for (i, j) in product(range(len(codes)), range(len(secrets))):
+        expected = _scalar_check_input(list(codes[i]), list(secrets[j]))
+        assert (correct[i, j], semi_correct[i, j]) == expected, (codes[i], secrets[j])
+        assert decode_feedback(feedback[i, j], num_slots) == expected
+        assert _check_input(list(codes[i]), list(secrets[j])) == expected
+
+
+def test_check_inputs_shapes():
+    (correct, semi_correct) = check_inputs([0, 1, 1], [[1, 1, 0], [2, 2, 2]])
+    assert correct.shape == (1, 2) and correct.tolist() == [[1, 0]] and semi_correct.tolist() == [[2, 0]]
+    with pytest.raises(ValueError):
+        check_inputs([[0, 1]], [[0, 1, 2]])
+
+
+@pytest.mark.parametrize('max_entries', [None, 0])
+@pytest.mark.parametrize(('num_slots', 'pin_amount'), SIZES)
+def test_table_matches_scalar(num_slots, pin_amount, max_entries):
+    # max_entries 0 scores the feedback on demand instead of precomputing it
+    table = FeedbackTable(num_slots, pin_amount, *([] if max_entries is None else [max_entries]))
+    rows = np.arange(table.num_codes)
+    feedback = table.feedback(rows, rows)
+    for (i, j) in product(rows, rows):
+        expected = _scalar_check_input(table.code(i), table.code(j))
+        assert decode_feedback(feedback[i, j], num_slots) == expected, (table.code(i), table.code(j))
+    assert (table.feedback_row(1) == feedback[1]).all()
+
+
+@pytest.mark.parametrize(('num_slots', 'pin_amount'), SIZES)
+def test_minimax_matches_scalar(num_slots, pin_amount):
+    table = FeedbackTable(num_slots, pin_amount)
+    all_codes = [table.code(i) for i in range(table.num_codes)]
+    for secret in np.random.RandomState(0).choice(table.num_codes, 4, replace=False):
+        secret = table.code(secret)
+        codes = np.ones(table.num_codes, dtype=bool)
+        guesses = codes.copy()
+        move = table.index(_first_move(num_slots, pin_amount))
+        while True:
+            codes[move] = False
+            feedback = _scalar_check_input(table.code(move), secret)
+            if feedback[0] == num_slots:
+                break
+            guesses &= table.feedback_row(move) == encode_feedback(*feedback, num_slots)
+            move = _select_move(table, codes, guesses)
+            expected = _scalar_move([all_codes[i] for i in np.flatnonzero(codes)],
+                                    [all_codes[i] for i in np.flatnonzero(guesses)])
+            assert table.code(move) == expected, secret
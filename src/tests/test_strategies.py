@@ -0,0 +1,21 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the move-scoring strategies of the classical solver. Run from the
+src directory with
+
+    python -m pytest tests
+"""
+import numpy as np
+import pytest
+
+from mastermind.game.algorithms.strategies import SCORES
+
+
+@pytest.mark.parametrize('strategy', SCORES)
+def test_scores_ignore_answer_order(strategy):
+    # Partition sizes of moves with the same partitions, in different orders
+    rng = np.random.RandomState(0)
+    sizes = rng.randint(0, 50, size=(1, 14))
+    moves = np.vstack([sizes] + [rng.permutation(sizes[0])[None] for _ in range(20)])
+    score = SCORES[strategy](moves, int(sizes.sum()))
+    assert (score == score[0]).all()
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Equivalence tests of the cached decision trees: a game played from the tree,
+freshly built or loaded from disk, plays the same moves as Knuth's solver
+scoring every move. Run from the src directory with
+
+    python -m pytest tests
+"""
+from itertools import product
+
+import pytest
+
+from mastermind.game.algorithms import strategy_cache
+from mastermind.game.simulation import HeadlessKnuth
+
+
+class _Knuth(HeadlessKnuth):
+    '''
+    Headless Knuth game that records the moves it plays.
+    '''
+
+    def get_input(self):
+        move = super(_Knuth, self).get_input()
+        self.played.append(move)
+        return move
+
+    def play(self, sequence):
+        self.played = []
+        super(_Knuth, self).play(sequence)
+        return self.played
+
+
+def _games(num_slots, pin_amount, strategy, use_strategy_cache):
+    return [_Knuth(10, num_slots, pin_amount, False, strategy=strategy,
+                   use_strategy_cache=use_strategy_cache).play(list(secret))
+            for secret in product(range(pin_amount), repeat=num_slots)]
+
+
+@pytest.mark.parametrize('strategy', ['minimax', 'entropy'])
+@pytest.mark.parametrize(('num_slots', 'pin_amount'), [(3, 3), (4, 3), (3, 4)])
+def test_tree_matches_knuth(tmp_path, monkeypatch, num_slots, pin_amount, strategy):
+    monkeypatch.setattr(strategy_cache, 'CACHE_DIR', str(tmp_path))
+    direct = _games(num_slots, pin_amount, strategy, False)
+
+    # Built from scratch, then loaded from disk
+    assert _games(num_slots, pin_amount, strategy, True) == direct
+    assert list(tmp_path.iterdir())
+    monkeypatch.setattr(strategy_cache, '_TREES', dict())
+    assert _games(num_slots, pin_amount, strategy, True) == direct
+    assert len(strategy_cache._TREES) == 1
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the circuit keys of the transpile cache and the emulator: circuits
+that only differ in the definition of a composite gate must not share a
+transpiled or compiled circuit.
+Run from the src directory with
+
+    python -m pytest tests
+"""
+from qiskit import QuantumCircuit, QuantumRegister, Aer
+
+from experiment.basis_emulator import BasisStateEmulator
+from experiment.qiskit_experiment import TranspileCache, circuit_key
+from mastermind.arithmetic.qft import iqft_gate
+
+
+def _circuit(gate):
+    q = QuantumRegister(gate.num_qubits, 'q')
+    circuit = QuantumCircuit(q)
+    circuit.append(gate, q[:])
+    return circuit
+
+
+def test_same_circuit_same_key():
+    assert circuit_key(_circuit(iqft_gate(3, 0.0, True))) == circuit_key(_circuit(iqft_gate(3, 0.0, True)))
+
+
+def test_definitions_in_key():
+    exact = _circuit(iqft_gate(3, 0.0, True))
+    approximate = _circuit(iqft_gate(3, 1.0, True))
+    # Same name and (no) parameters, different definitions
+    assert exact.data[0][0].name == approximate.data[0][0].name
+    assert circuit_key(exact) != circuit_key(approximate)
+
+
+def test_definitions_miss_cache():
+    cache = TranspileCache()
+    backend = Aer.get_backend('aer_simulator')
+    exact = cache.transpile(_circuit(iqft_gate(3, 0.0, True)), backend, 1)
+    approximate = cache.transpile(_circuit(iqft_gate(3, 1.0, True)), backend, 1)
+    assert cache.misses == 2 and cache.hits == 0
+    assert exact.count_ops() != approximate.count_ops()
+
+
+def _named_gate(flip):
+    definition = QuantumCircuit(1, name='g')
+    if flip:
+        definition.x(0)
+    else:
+        definition.z(0)
+    gate = definition.to_gate()
+    circuit = QuantumCircuit(1, 1)
+    circuit.append(gate, [0])
+    circuit.measure(0, 0)
+    return circuit
+
+
+def test_emulator_definitions_miss_cache():
+    emulator = BasisStateEmulator()
+    (flip, phase) = (_named_gate(True), _named_gate(False))
+    assert emulator.compile(flip) is not emulator.compile(phase)
+    counts = emulator.run([flip, phase], shots=8).result()
+    assert counts.get_counts(0) == {'1': 8}
+    assert counts.get_counts(1) == {'0': 8}